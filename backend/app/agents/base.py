@@ -1,44 +1,54 @@
+import asyncio
 import os
 import json
-import re
-from langchain_groq import ChatGroq
+from typing import AsyncIterator, Optional, Type
+from pydantic import BaseModel
 from langchain_core.messages import SystemMessage, HumanMessage
 from dotenv import load_dotenv
-from sqlmodel import Session, select
-from ..db.database import engine # Import engine to query DB
-from ..db.models import AppSettings
+from ..db.context_cache import context_cache
+from .llm_registry import get_llm, DEFAULT_MODEL
+from .response_cache import response_cache
+from .json_stream import ArrayItemStream
+from .singleflight import llm_flights
+from .json_repair import parse_llm_json
+from .schemas import validate_output
+from .rate_limit import RateLimited, estimate_tokens, get_rate_limiter, is_rate_limit, retry_after_from
+from .resilience import CallPolicy, ProviderUnavailable, get_breaker, is_transient, ainvoke_with_resilience
 
 load_dotenv()
 
 class BaseAgent:
+    # Opt-in response cache: subclasses set a TTL in seconds to enable it
+    cache_ttl: Optional[int] = None
+    # Pydantic model the parsed output is validated against (agents/schemas.py)
+    output_schema: Optional[Type[BaseModel]] = None
+    # Latency budget / retries / hedging for every LLM call this agent makes
+    call_policy: CallPolicy = CallPolicy()
+
     def __init__(self, role: str):
         self.role = role
+        self.model_name = DEFAULT_MODEL
         self.api_key = self._get_api_key()
         
-        # Guard clause: If no key, we can't initialize the LLM yet
-        if self.api_key:
-            self.llm = ChatGroq(
-                temperature=0, 
-                model_name="openai/gpt-oss-120b", # Using versatile for better availability
-                api_key=self.api_key
-            )
-        else:
-            self.llm = None
+        # Borrow the shared client (None if no key yet)
+        self.llm = get_llm(self.api_key, model_name=self.model_name)
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """
+        Build the agent from async code. Warms the settings cache off the event
+        loop first, so __init__'s key lookup is a cache hit instead of a
+        blocking SQLite read.
+        """
+        await context_cache.aget_setting("groq_api_key")
+        return cls(*args, **kwargs)
 
     def _get_api_key(self) -> str:
         """
-        STRICT MODE: Only load from Database.
+        STRICT MODE: Only load from Database (via the settings cache).
         Ignores .env and System Variables.
         """
-        try:
-            with Session(engine) as session:
-                setting = session.get(AppSettings, "groq_api_key")
-                if setting and setting.value:
-                    return setting.value
-        except Exception:
-            pass 
-            
-        return None  # <--- REMOVED os.getenv("GROQ_API_KEY")
+        return context_cache.get_setting("groq_api_key")
 
     def _load_prompt(self, prompt_name: str) -> str:
         import sys
@@ -51,32 +61,132 @@ class BaseAgent:
         with open(path, "r") as f:
             return f.read()
 
-    def _clean_json_text(self, text: str) -> str:
-        if "```" in text:
-            pattern = r"```(?:json)?\s*(\{.*?\})\s*```"
-            match = re.search(pattern, text, re.DOTALL)
-            if match: return match.group(1)
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1: return text[start : end + 1]
-        return text
-
-    def run(self, user_input: str, context: dict = None) -> dict:
-        if not self.llm:
-            return {"error": "API Key Missing. Please go to Settings."}
-
+    def _build_messages(self, user_input: str, context: dict = None) -> list:
         system_prompt = self._load_prompt(f"{self.role}_system")
         full_prompt = f"{system_prompt}\n\nCONTEXT: {json.dumps(context) if context else '{}'}"
 
-        messages = [
+        return [
             SystemMessage(content=full_prompt),
             HumanMessage(content=user_input)
         ]
 
+    def _parse_response(self, content: str) -> dict:
+        # Local repair first; schema errors surface as exceptions to the caller
+        return validate_output(self.output_schema, parse_llm_json(content))
+
+    def _cache_lookup(self, messages: list, model_name: str = None):
+        if not self.cache_ttl:
+            return None, None
+        key = response_cache.make_key(self.role, model_name or self.model_name, messages)
+        return key, response_cache.get(key, self.cache_ttl)
+
+    def _cache_store(self, key: Optional[str], result: dict, model_name: str = None) -> None:
+        # Never cache failures, they should be retried for real
+        if key and isinstance(result, dict) and "error" not in result:
+            response_cache.put(key, self.role, model_name or self.model_name, result)
+
+    async def _ainvoke(self, messages: list, llm=None, model_name: str = None, policy: CallPolicy = None):
+        return await ainvoke_with_resilience(
+            llm or self.llm, messages, policy or self.call_policy, model_name or self.model_name
+        )
+
+    @staticmethod
+    def _provider_error(e: Exception) -> dict:
+        # Callers can tell "the provider failed" apart from "the model said no"
+        return {"error": str(e), "provider_unavailable": True}
+
+    def _flight_key(self, messages: list, cache_key: Optional[str], model_name: str = None) -> str:
+        return cache_key or response_cache.make_key(self.role, model_name or self.model_name, messages)
+
+    async def _acomplete(self, messages: list, cache_key: Optional[str]) -> dict:
+        try:
+            response = await self._ainvoke(messages)
+            result = self._parse_response(response.content)
+        except ProviderUnavailable as e:
+            return self._provider_error(e)
+        except Exception as e:
+            return {"error": str(e)}
+
+        await asyncio.to_thread(self._cache_store, cache_key, result)
+        return result
+
+    async def arun(self, user_input: str, context: dict = None) -> dict:
+        if not self.llm:
+            return {"error": "API Key Missing. Please go to Settings."}
+
+        messages = self._build_messages(user_input, context)
+        # The response cache is sync SQLite; don't run it on the event loop
+        cache_key, cached = await asyncio.to_thread(self._cache_lookup, messages)
+        if cached is not None:
+            return cached
+
+        # Identical requests already in flight share that call instead of starting another
+        return await llm_flights.ado(
+            self._flight_key(messages, cache_key),
+            lambda: self._acomplete(messages, cache_key)
+        )
+
+    async def astream_items(self, user_input: str, context: dict = None, array_key: str = None) -> AsyncIterator[dict]:
+        """
+        Stream the LLM completion and yield each object of the output's
+        top-level `array_key` array (e.g. planner "tasks") as soon as it closes.
+        """
+        if not self.llm:
+            raise RuntimeError("API Key Missing. Please go to Settings.")
+
+        breaker = get_breaker(self.model_name)
+        if not breaker.allow():
+            raise ProviderUnavailable("LLM provider is degraded, try again shortly.")
+
+        messages = self._build_messages(user_input, context)
+        limiter = get_rate_limiter(self.model_name)
+        try:
+            permit = await limiter.aacquire(self.call_policy.priority, estimate_tokens(messages), self.call_policy.timeout)
+        except RateLimited as e:
+            breaker.release_probe()
+            raise ProviderUnavailable(str(e))
+        except BaseException:
+            breaker.release_probe()
+            raise
+
+        parser = ArrayItemStream(array_key)
+        stream = self.llm.astream(messages).__aiter__()
         try:
-            response = self.llm.invoke(messages)
-            content = response.content
-            cleaned_content = self._clean_json_text(content)
-            return json.loads(cleaned_content)
+            while True:
+                # The budget applies per chunk, so a stalled stream fails instead of hanging the client
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), self.call_policy.timeout)
+                except StopAsyncIteration:
+                    break
+                for item in parser.feed(str(chunk.content or "")):
+                    yield item
+        except asyncio.TimeoutError:
+            limiter.release(permit)
+            breaker.record_failure()
+            raise ProviderUnavailable(f"LLM stream stalled for {self.call_policy.timeout:g}s, try again shortly.")
         except Exception as e:
-            return {"error": str(e)}
\ No newline at end of file
+            rate_limited = is_rate_limit(e)
+            limiter.release(permit, rate_limited=rate_limited, retry_after=retry_after_from(e))
+            if rate_limited:
+                # Backpressure, not an outage: leave the breaker closed
+                breaker.release_probe()
+                raise ProviderUnavailable("LLM provider is rate limiting requests, try again shortly.")
+            if is_transient(e):
+                breaker.record_failure()
+            else:
+                breaker.release_probe()
+            raise
+        except BaseException:
+            # Client went away mid-stream
+            limiter.release(permit)
+            breaker.release_probe()
+            raise
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+        limiter.release(permit)
+        breaker.record_success()
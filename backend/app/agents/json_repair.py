@@ -0,0 +1,146 @@
+import json
+import re
+from typing import List
+
+# Local, dependency-free recovery of JSON objects from LLM output.
+# Handles code fences, prose around the object, trailing commas, unescaped
+# quotes / raw newlines inside strings, Python literals and truncated output.
+
+FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+DANGLING_KEY_RE = re.compile(r'[,{]\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class JSONRepairError(ValueError):
+    pass
+
+
+def _strip_fences(text: str) -> str:
+    for block in FENCE_RE.findall(text):
+        if "{" in block:
+            return block
+    # Unterminated fence (truncated output): drop the opening marker
+    if "```" in text:
+        text = text.split("```", 1)[1]
+        if text[:4].lower() == "json":
+            text = text[4:]
+    return text
+
+
+def _closes_string(text: str, i: int) -> bool:
+    # A quote only ends a string if what follows is structural
+    j = i + 1
+    while j < len(text) and text[j] in " \t\r\n":
+        j += 1
+    return j >= len(text) or text[j] in ",:}]"
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    k = len(out) - 1
+    while k >= 0 and out[k] in " \t\r\n":
+        k -= 1
+    if k >= 0 and out[k] == ",":
+        del out[k]
+
+
+def _repair(text: str) -> str:
+    out: List[str] = []
+    stack: List[str] = []
+    starts: List[int] = [] # position in `out` where each open container begins
+    in_string = False
+    escape = False
+    i = 0
+
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escape:
+                out.append(ch)
+                escape = False
+            elif ch == "\\":
+                out.append(ch)
+                escape = True
+            elif ch == '"':
+                if _closes_string(text, i):
+                    in_string = False
+                    out.append(ch)
+                else:
+                    out.append('\\"')
+            else:
+                out.append(STRING_ESCAPES.get(ch, ch))
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            starts.append(len(out))
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+                starts.pop()
+            out.append(ch)
+            if not stack:
+                break # Top-level value is complete, ignore trailing prose
+        else:
+            literal = next((k for k in PY_LITERALS if text.startswith(k, i)), None)
+            if literal:
+                out.append(PY_LITERALS[literal])
+                i += len(literal)
+                continue
+            out.append(ch)
+        i += 1
+
+    if not stack:
+        return "".join(out)
+
+    # Truncated output. An object cut off inside an array (the next task or
+    # milestone) is dropped whole: closing it would give a {} or half an item
+    # that fails schema validation and takes the complete items down with it.
+    array_depth = max((d for d, closer in enumerate(stack) if closer == "]"), default=None)
+    if array_depth is not None and array_depth + 1 < len(stack) and stack[array_depth + 1] == "}":
+        del out[starts[array_depth + 1]:]
+        del stack[array_depth + 1:]
+        in_string = False
+        _drop_trailing_comma(out)
+
+    # Close the open string, drop a dangling key/comma, close containers
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    repaired = "".join(out).rstrip()
+    if repaired.endswith(":") or (stack[-1] == "}" and DANGLING_KEY_RE.search(repaired)):
+        repaired = DANGLING_KEY_RE.sub(lambda m: m.group(0)[0] if m.group(0)[0] == "{" else "", repaired)
+    repaired = repaired.rstrip().rstrip(",")
+    return repaired + "".join(reversed(stack))
+
+
+def parse_llm_json(text: str) -> dict:
+    """
+    Parse a JSON object out of raw model output, repairing it locally when
+    needed. Raises JSONRepairError if nothing usable can be recovered.
+    """
+    text = str(text or "")
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError:
+        pass
+
+    body = _strip_fences(text)
+    start = body.find("{")
+    if start == -1:
+        raise JSONRepairError("No JSON object found in model output")
+
+    try:
+        data = json.loads(_repair(body[start:]))
+    except json.JSONDecodeError as e:
+        raise JSONRepairError(f"Could not repair model output: {e}") from e
+
+    if not isinstance(data, dict):
+        raise JSONRepairError("Model output is not a JSON object")
+    return data
@@ -0,0 +1,78 @@
+import json
+from typing import Iterator, List, Optional
+
+
+class ArrayItemStream:
+    """
+    Incremental scanner for LLM output shaped like {"key": [ {...}, {...} ]}.
+
+    feed() takes raw text chunks as they arrive and returns every object of
+    the `key` array (any top-level array when key is None) that closed within
+    them, so callers can act on item N before item N+1 has been generated.
+    Text outside the top-level object (code fences, prose) is ignored, and so
+    are braces inside strings.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None # chars of a string directly in the top-level object
+        self._last_key: Optional[str] = None
+        self._in_target = False # the open top-level array is the one we stream
+        self._item: List[str] = [] # chars of the item currently being read
+        self._done = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        items = []
+        for item in self._scan(chunk):
+            try:
+                items.append(json.loads(item))
+            except json.JSONDecodeError:
+                # Malformed item, skip it rather than abort the whole stream
+                continue
+        return items
+
+    def _scan(self, chunk: str) -> Iterator[str]:
+        for ch in chunk:
+            if self._done:
+                return
+
+            if self._item:
+                self._item.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                elif self._key_chars is not None:
+                    self._key_chars.append(ch)
+                continue
+
+            if ch == '"':
+                # Strings only matter once we're inside the top-level object
+                if self._stack:
+                    self._in_string = True
+                    self._key_chars = [] if len(self._stack) == 1 else None
+            elif ch == "{" or (ch == "[" and self._stack):
+                if ch == "{" and self._in_target and self._stack == ["{", "["]:
+                    self._item = [ch] # A new element of the streamed array
+                elif ch == "[" and len(self._stack) == 1:
+                    self._in_target = self.key is None or self._last_key == self.key
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if ch == "}" and len(self._stack) == 2 and self._item:
+                    yield "".join(self._item)
+                    self._item = []
+                elif ch == "]" and len(self._stack) == 1:
+                    self._in_target = False
+                elif not self._stack:
+                    self._done = True
@@ -0,0 +1,58 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+from langchain_groq import ChatGroq
+
+DEFAULT_MODEL = "openai/gpt-oss-120b"
+VISION_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+# Hard socket-level ceiling; per-agent budgets (CallPolicy.timeout) are tighter
+REQUEST_TIMEOUT_CEILING = 90
+
+# (model_name, api_key, temperature) -> shared client
+_clients: Dict[Tuple[str, str, float], ChatGroq] = {}
+_lock = threading.Lock()
+
+
+def get_llm(api_key: Optional[str], model_name: str = DEFAULT_MODEL, temperature: float = 0) -> Optional[ChatGroq]:
+    """
+    Borrow a process-wide ChatGroq client.
+
+    Each ChatGroq owns an HTTP connection pool, so handing out the same
+    instance keeps TLS sessions alive across requests instead of paying
+    a handshake per agent construction.
+    """
+    if not api_key:
+        return None
+
+    cache_key = (model_name, api_key, temperature)
+    client = _clients.get(cache_key)
+    if client is not None:
+        return client
+
+    with _lock:
+        # Another thread may have built it while we waited
+        client = _clients.get(cache_key)
+        if client is None:
+            client = ChatGroq(
+                temperature=temperature,
+                model_name=model_name,
+                api_key=api_key,
+                max_retries=0, # Retries/backoff are handled by agents/resilience.py
+                request_timeout=REQUEST_TIMEOUT_CEILING
+            )
+            _clients[cache_key] = client
+        return client
+
+
+def reset_clients(api_key: Optional[str] = None) -> None:
+    """
+    Drop cached clients so the next borrow rebuilds them.
+    Called when the key changes in /settings/key. With an api_key,
+    every client NOT using that key is dropped.
+    """
+    with _lock:
+        if api_key is None:
+            _clients.clear()
+            return
+        for cache_key in [k for k in _clients if k[1] != api_key]:
+            del _clients[cache_key]
@@ -1,19 +1,27 @@
 from .base import BaseAgent
+from .rate_limit import PRIORITY_BACKGROUND
+from .resilience import CallPolicy
+from .schemas import RewardOutput
 
 class MotivatorAgent(BaseAgent):
+    output_schema = RewardOutput
+    call_policy = CallPolicy(timeout=20, retries=1, priority=PRIORITY_BACKGROUND)
     def __init__(self):
         super().__init__(role="motivator")
 
-    def distribute_rewards(self, task_title: str, estimated_time: int, quality_score: int, current_streak: int) -> dict:
-        context = {
+    def _build_context(self, task_title: str, estimated_time: int, quality_score: int, current_streak: int) -> dict:
+        return {
             "task": task_title,
             "difficulty_minutes": estimated_time,
             "quality_score": quality_score,
             "current_streak": current_streak
         }
-        
+
+    async def adistribute_rewards(self, task_title: str, estimated_time: int, quality_score: int, current_streak: int) -> dict:
+        context = self._build_context(task_title, estimated_time, quality_score, current_streak)
+
         # We assume the user deserves a reward if this is called
-        return self.run(
-            user_input="Task completed successfully. Calculate rewards.", 
+        return await self.arun(
+            user_input="Task completed successfully. Calculate rewards.",
             context=context
         )
\ No newline at end of file
@@ -1,14 +1,20 @@
 # backend/app/agents/planner.py
 from .base import BaseAgent
+from .rate_limit import PRIORITY_PLANNING
+from .resilience import CallPolicy
+from .schemas import PlanOutput, PlannedTask
+from pydantic import ValidationError
 from datetime import datetime
 
 class PlannerAgent(BaseAgent):
+    output_schema = PlanOutput
+    call_policy = CallPolicy(timeout=45, retries=2, priority=PRIORITY_PLANNING)
+    cache_ttl = 300 # Context carries the current minute, so only near-identical replans hit
+
     def __init__(self):
         super().__init__(role="planner")
 
-    # Update the method signature
-    def create_plan(self, user_goal: str, available_time: int, user_profile: dict = None, existing_schedule: str = "None") -> dict:
-        
+    def _build_context(self, available_time: int, user_profile: dict = None, existing_schedule: str = "None") -> dict:
         now = datetime.now()
         current_time = now.strftime("%H:%M")
         today_date = now.strftime("%Y-%m-%d") # <--- NEW CONTEXT
@@ -40,5 +46,18 @@ class PlannerAgent(BaseAgent):
                 "Format 'target_date' strictly as YYYY-MM-DD."
             ]
         }
-        
-        return self.run(user_goal, context)
\ No newline at end of file
+        return context
+
+    # Update the method signature
+    async def acreate_plan(self, user_goal: str, available_time: int, user_profile: dict = None, existing_schedule: str = "None") -> dict:
+        context = self._build_context(available_time, user_profile, existing_schedule)
+        return await self.arun(user_goal, context)
+
+    async def astream_plan(self, user_goal: str, available_time: int, user_profile: dict = None, existing_schedule: str = "None"):
+        # Yields task dicts one by one while the plan is still being generated
+        context = self._build_context(available_time, user_profile, existing_schedule)
+        async for task_data in self.astream_items(user_goal, context, array_key="tasks"):
+            try:
+                yield PlannedTask.model_validate(task_data).model_dump(exclude_none=True)
+            except ValidationError as e:
+                print(f"Skipping malformed streamed task: {e}")
\ No newline at end of file
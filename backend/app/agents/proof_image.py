@@ -0,0 +1,72 @@
+import base64
+import hashlib
+import io
+from typing import Union
+
+from ..config import PROOF_IMAGE_MAX_DIMENSION, PROOF_IMAGE_TARGET_BYTES
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # Pillow missing: images are forwarded untouched
+    Image = None
+
+JPEG_QUALITY_STEPS = (85, 75, 65, 50, 40)
+
+
+class PreparedImage:
+    def __init__(self, data: bytes, content_hash: str, original_bytes: int):
+        self.data = data
+        self.content_hash = content_hash # sha256 of the bytes the client sent
+        self.original_bytes = original_bytes
+
+    @property
+    def b64(self) -> str:
+        return base64.b64encode(self.data).decode("ascii")
+
+
+def decode_image(image: Union[str, bytes]) -> bytes:
+    if isinstance(image, bytes):
+        return image
+    # Accept both raw base64 and full data URLs
+    if image.startswith("data:") and "," in image:
+        image = image.split(",", 1)[1]
+    return base64.b64decode(image)
+
+
+def _recompress(raw: bytes) -> bytes:
+    with Image.open(io.BytesIO(raw)) as img:
+        img = ImageOps.exif_transpose(img) # Phone photos: honour rotation before resizing
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((PROOF_IMAGE_MAX_DIMENSION, PROOF_IMAGE_MAX_DIMENSION))
+
+        out = b""
+        for quality in JPEG_QUALITY_STEPS:
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=quality, optimize=True)
+            out = buffer.getvalue()
+            if len(out) <= PROOF_IMAGE_TARGET_BYTES:
+                break
+        return out
+
+
+def prepare_proof_image(image: Union[str, bytes]) -> PreparedImage:
+    """
+    Decode, bound the resolution and recompress a proof image to roughly
+    PROOF_IMAGE_TARGET_BYTES of JPEG, so the vision call uploads as little
+    as possible. The hash is taken on the original bytes so resubmitting
+    the same file can be recognised without re-encoding it.
+    """
+    raw = decode_image(image)
+    content_hash = hashlib.sha256(raw).hexdigest()
+
+    data = raw
+    if Image is not None:
+        try:
+            recompressed = _recompress(raw)
+            if len(recompressed) < len(raw):
+                data = recompressed
+        except Exception as e:
+            print(f"Image preprocessing skipped: {e}")
+
+    return PreparedImage(data, content_hash, len(raw))
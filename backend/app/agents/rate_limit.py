@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Optional
+
+from ..config import GROQ_MAX_CONCURRENCY, GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0 # /verify, key validation
+PRIORITY_PLANNING = 1 # /plan, /campaign/strategize
+PRIORITY_BACKGROUND = 5 # reward messages after /verify
+PRIORITY_REPORTING = 8 # /analytics/report
+
+ASYNC_POLL_INTERVAL = 0.05
+
+
+class RateLimited(Exception):
+    """No permit could be obtained within the caller's wait budget."""
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests bigger than the bucket are let through once it is full
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+
+class Permit:
+    def __init__(self, limiter: "RateLimiter", estimated_tokens: int):
+        self.limiter = limiter
+        self.estimated_tokens = estimated_tokens
+
+
+class RateLimiter:
+    """
+    Process-wide gate in front of Groq for one model.
+
+    - Requests/min and tokens/min are enforced with token buckets. The token
+      charge is an estimate up front, corrected with real usage afterwards.
+    - Concurrency adapts AIMD-style: +1/limit per success, halved on a 429,
+      and all callers pause for the provider's retry-after.
+    - Waiters are served strictly by (priority, arrival), so interactive
+      calls overtake queued analytics work.
+    """
+
+    def __init__(self, rpm: int = GROQ_REQUESTS_PER_MINUTE, tpm: int = GROQ_TOKENS_PER_MINUTE, max_concurrency: int = GROQ_MAX_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    # --- acquisition ---
+
+    def _try_grant(self, ticket, estimated_tokens: int) -> float:
+        """Called with the lock held. Returns 0 when granted, else a suggested wait."""
+        now = time.monotonic()
+        if self._queue[0] != ticket:
+            return ASYNC_POLL_INTERVAL
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.concurrency_limit):
+            return ASYNC_POLL_INTERVAL
+
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+        if wait > 0:
+            return wait
+
+        self.requests.tokens -= 1
+        self.tokens.tokens -= min(estimated_tokens, self.tokens.capacity)
+        self.in_flight += 1
+        heapq.heappop(self._queue)
+        self._cond.notify_all()
+        return 0.0
+
+    def _enqueue(self, priority: int):
+        ticket = (priority, next(self._seq))
+        heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _abandon(self, ticket) -> None:
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    async def aacquire(self, priority: int, estimated_tokens: int, max_wait: float) -> Permit:
+        deadline = time.monotonic() + max_wait
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_grant(ticket, estimated_tokens)
+                if wait == 0:
+                    return Permit(self, estimated_tokens)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RateLimited(f"Rate limit queue wait exceeded {max_wait:.0f}s")
+                await asyncio.sleep(min(wait, remaining, ASYNC_POLL_INTERVAL * 4))
+        except BaseException:
+            with self._cond:
+                self._abandon(ticket)
+            raise
+
+    # --- feedback ---
+
+    def release(self, permit: Permit, used_tokens: Optional[int] = None, rate_limited: bool = False, retry_after: Optional[float] = None) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if used_tokens is not None:
+                # Settle the estimate against what the provider actually billed
+                self.tokens.tokens -= used_tokens - min(permit.estimated_tokens, self.tokens.capacity)
+            if rate_limited:
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+                self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or 1.0))
+            else:
+                self.concurrency_limit = min(float(self.max_concurrency), self.concurrency_limit + 1.0 / self.concurrency_limit)
+            self._cond.notify_all()
+
+    def observe_headers(self, headers) -> None:
+        """Sync local buckets with Groq's x-ratelimit-* response headers."""
+        if not headers:
+            return
+        with self._cond:
+            for header, bucket in (("x-ratelimit-remaining-requests", self.requests), ("x-ratelimit-remaining-tokens", self.tokens)):
+                value = _number(headers.get(header))
+                if value is not None:
+                    bucket.tokens = min(bucket.tokens, value)
+            self._cond.notify_all()
+
+    def has_headroom(self) -> bool:
+        # Hedged duplicates only make sense when we're not already being throttled
+        with self._cond:
+            return not self._queue and self.concurrency_limit >= self.max_concurrency and time.monotonic() >= self.paused_until
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "concurrency_limit": round(self.concurrency_limit, 2),
+                "queued": len(self._queue),
+                "requests_available": round(self.requests.tokens, 1),
+                "tokens_available": round(self.tokens.tokens),
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            }
+
+
+def _number(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(str(value).rstrip("s"))
+    except ValueError:
+        return None
+
+
+def is_rate_limit(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(exc).__name__
+
+
+def retry_after_from(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    return _number(headers.get("retry-after"))
+
+
+def headers_from(exc: BaseException):
+    return getattr(getattr(exc, "response", None), "headers", None)
+
+
+def estimate_tokens(messages, max_output: int = 1024) -> int:
+    # ~4 chars per token for English prompts, plus room for the completion
+    chars = 0
+    for m in messages:
+        content = m.content
+        if isinstance(content, list):
+            # Multimodal: count text parts, images are billed roughly flat
+            chars += sum(len(part.get("text", "")) if part.get("type") == "text" else 4000 for part in content)
+        else:
+            chars += len(str(content))
+    return chars // 4 + max_output
+
+
+def used_tokens_from(response) -> Optional[int]:
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    total = usage.get("total_tokens")
+    return int(total) if total is not None else None
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str) -> RateLimiter:
+    # Groq budgets are per model, so each model gets its own buckets
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = RateLimiter()
+        return _limiters[model_name]
+
+
+def limiter_snapshot() -> dict:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.snapshot() for name, limiter in limiters.items()}
@@ -1,20 +1,31 @@
+from ..config import LLM_CACHE_DEFAULT_TTL
 from .base import BaseAgent
+from .rate_limit import PRIORITY_REPORTING
+from .resilience import CallPolicy
+from .schemas import DebriefOutput
 
 class ReflectorAgent(BaseAgent):
+    output_schema = DebriefOutput
+    call_policy = CallPolicy(timeout=45, retries=1, priority=PRIORITY_REPORTING)
+    cache_ttl = LLM_CACHE_DEFAULT_TTL # Same week of history -> same debrief
+
     def __init__(self):
         super().__init__(role="reflector")
 
-    def generate_debrief(self, user_name: str, history_summary: str, trust_score: int) -> dict:
-        context = {
+    def _build_context(self, user_name: str, history_summary: str, trust_score: int) -> dict:
+        return {
             "user": user_name,
             "history": history_summary,
             "trust_score": trust_score,
             "rules": [
                 "Be a Tactical Analyst. Concise, direct, military-style.",
                 "Analyze the 'History' for patterns (e.g. failing at night, skipping hard tasks).",
+                "History is a pre-aggregated summary: per-day and per-hour done/failed counts, top failure reasons, streaks.",
                 "Comment on the 'Trust Score'. If low, warn them. If high, praise discipline.",
                 "Give 1 specific strategic recommendation for next week."
             ]
         }
-        
-        return self.run(f"Generate weekly tactical debrief for Operator {user_name}.", context)
\ No newline at end of file
+
+    async def agenerate_debrief(self, user_name: str, history_summary: str, trust_score: int) -> dict:
+        context = self._build_context(user_name, history_summary, trust_score)
+        return await self.arun(f"Generate weekly tactical debrief for Operator {user_name}.", context)
\ No newline at end of file
@@ -0,0 +1,142 @@
+from datetime import date, datetime, timedelta
+from difflib import SequenceMatcher
+from typing import List, Tuple
+
+from sqlmodel import Session, select, func
+
+from ..config import REFLECTOR_CONTEXT_TOKEN_BUDGET
+from ..db.models import Task
+
+FAILED_STATUSES = ("retry", "failed", "partial")
+REASON_SIMILARITY = 0.6
+MAX_REASON_ROWS = 50 # distinct reasons pulled from SQL before clustering
+MAX_REASON_CLUSTERS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars per token is close enough for budgeting English prose
+    return len(text) // 4 + 1
+
+
+def _cluster_reasons(rows: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """Greedy single-pass clustering of failure reasons by string similarity."""
+    clusters: List[List] = [] # [representative, count]
+    for reason, count in rows:
+        reason = reason.replace("PARTIAL:", "").strip()
+        for cluster in clusters:
+            if SequenceMatcher(None, cluster[0].lower(), reason.lower()).ratio() >= REASON_SIMILARITY:
+                cluster[1] += count
+                break
+        else:
+            clusters.append([reason, count])
+    clusters.sort(key=lambda c: c[1], reverse=True)
+    return [(c[0], c[1]) for c in clusters[:MAX_REASON_CLUSTERS]]
+
+
+def _longest_streak(days: List[date]) -> int:
+    longest = current = 0
+    previous = None
+    for day in sorted(days):
+        current = current + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return longest
+
+
+class WeeklyContext:
+    def __init__(self, summary: str, trust_score: int, token_count: int, task_count: int):
+        self.summary = summary
+        self.trust_score = trust_score
+        self.token_count = token_count
+        self.task_count = task_count
+
+
+def build_weekly_context(session: Session, user_id: str, days: int = 7, token_budget: int = REFLECTOR_CONTEXT_TOKEN_BUDGET) -> WeeklyContext:
+    """
+    Summarize the last `days` of a user's tasks for the ReflectorAgent.
+    Everything is aggregated in SQL, so the prompt size depends on the
+    number of days/hours/reason clusters, not on how many tasks were logged.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    scope = (Task.user_id == user_id, Task.created_at >= since)
+
+    # 1. Per-day outcome counts
+    day_col = func.date(Task.created_at)
+    per_day = session.exec(
+        select(day_col, Task.status, func.count(Task.id), func.coalesce(func.sum(Task.estimated_time), 0))
+        .where(*scope)
+        .group_by(day_col, Task.status)
+    ).all()
+
+    # 2. Per-hour outcome counts (scheduled "HH:MM" only)
+    hour_col = func.substr(Task.scheduled_time, 1, 2)
+    per_hour = session.exec(
+        select(hour_col, Task.status, func.count(Task.id))
+        .where(*scope)
+        .where(Task.scheduled_time.op("GLOB")("[0-2][0-9]:[0-5][0-9]*"))
+        .group_by(hour_col, Task.status)
+    ).all()
+
+    # 3. Most frequent failure reasons
+    reasons = session.exec(
+        select(Task.last_failure_reason, func.count(Task.id))
+        .where(*scope)
+        .where(Task.status.in_(FAILED_STATUSES))
+        .where(Task.last_failure_reason.is_not(None))
+        .group_by(Task.last_failure_reason)
+        .order_by(func.count(Task.id).desc())
+        .limit(MAX_REASON_ROWS)
+    ).all()
+
+    days_stats = {}
+    totals = {"completed": 0, "retry": 0, "partial": 0, "pending": 0, "minutes": 0}
+    for day, status, count, minutes in per_day:
+        stats = days_stats.setdefault(str(day), {"done": 0, "failed": 0, "total": 0})
+        stats["total"] += count
+        if status == "completed":
+            stats["done"] += count
+            totals["minutes"] += minutes
+        elif status in FAILED_STATUSES:
+            stats["failed"] += count
+        key = status if status in totals else ("retry" if status == "failed" else "pending")
+        totals[key] += count
+    task_count = sum(s["total"] for s in days_stats.values())
+
+    hours = {}
+    for hour, status, count in per_hour:
+        stats = hours.setdefault(hour, {"done": 0, "failed": 0})
+        if status == "completed":
+            stats["done"] += count
+        elif status in FAILED_STATUSES:
+            stats["failed"] += count
+
+    verifiable = totals["completed"] + totals["retry"]
+    trust_score = int(totals["completed"] / verifiable * 100) if verifiable else 100
+
+    active_days = [datetime.strptime(d, "%Y-%m-%d").date() for d, s in days_stats.items() if s["done"] > 0]
+
+    # Sections in priority order; lower ones are dropped first when over budget
+    sections = [
+        f"WEEK TOTALS: {task_count} tasks, {totals['completed']} completed, {totals['retry']} failed, "
+        f"{totals['partial']} partial, {totals['pending']} pending, {totals['minutes']} focused minutes.",
+        f"LONGEST STREAK: {_longest_streak(active_days)} consecutive days with a completion.",
+    ]
+    clusters = _cluster_reasons(reasons)
+    if clusters:
+        sections.append("TOP FAILURE REASONS: " + "; ".join(f"{r[:120]} (x{c})" for r, c in clusters))
+    if hours:
+        sections.append("BY HOUR (done/failed): " + ", ".join(
+            f"{h}h {s['done']}/{s['failed']}" for h, s in sorted(hours.items())
+        ))
+    if days_stats:
+        sections.append("BY DAY (done/failed/total): " + ", ".join(
+            f"{d[5:]} {s['done']}/{s['failed']}/{s['total']}" for d, s in sorted(days_stats.items())
+        ))
+
+    while len(sections) > 1 and estimate_tokens("\n".join(sections)) > token_budget:
+        sections.pop()
+    summary = "\n".join(sections)
+
+    token_count = estimate_tokens(summary)
+    print(f"Reflector context: {token_count} tokens (~budget {token_budget}) for {task_count} tasks")
+    return WeeklyContext(summary, trust_score, token_count, task_count)
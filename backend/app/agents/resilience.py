@@ -0,0 +1,247 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from .rate_limit import (
+    PRIORITY_PLANNING, RateLimited, estimate_tokens, get_rate_limiter,
+    headers_from, is_rate_limit, retry_after_from, used_tokens_from,
+)
+
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# Don't start another attempt with less budget than this left (until the model has a p95)
+MIN_ATTEMPT_SECONDS = 2.0
+
+
+class ProviderUnavailable(Exception):
+    """The LLM provider could not answer within the agent's budget (or the circuit is open)."""
+
+
+class CallPolicy:
+    """Per-agent latency budget and retry/hedging settings for one LLM invocation."""
+
+    def __init__(self, timeout: float = 30.0, retries: int = 2, backoff: float = 0.5, hedge: bool = False, hedge_after: float = 5.0, priority: int = PRIORITY_PLANNING):
+        self.timeout = timeout # seconds for the whole call: permit waits, attempts, backoff and retries
+        self.retries = retries # extra attempts on transient errors, while the budget allows
+        self.backoff = backoff # base delay, doubled per attempt, with full jitter
+        self.hedge = hedge # fire a duplicate request once the first is slower than p95
+        self.hedge_after = hedge_after # hedge delay used until enough latencies are recorded
+        self.priority = priority # rate limiter queue priority (agents/rate_limit.py)
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one model."""
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open breaker. After `failure_threshold`
+    consecutive transient failures it opens and rejects calls for
+    `reset_timeout` seconds, then lets a single probe through.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self) -> None:
+        # The probe ended without a verdict (rate-limited, cancelled...): let the next call probe
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model_name: str) -> CircuitBreaker:
+    # One breaker per model: a degraded vision model shouldn't block text agents
+    with _breakers_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker()
+        return _breakers[model_name]
+
+
+def get_latency_tracker(model_name: str) -> LatencyTracker:
+    with _breakers_lock:
+        if model_name not in _latencies:
+            _latencies[model_name] = LatencyTracker()
+        return _latencies[model_name]
+
+
+def _hedge_delay(policy: CallPolicy, latency: LatencyTracker, limiter, budget: float) -> Optional[float]:
+    if not policy.hedge or not limiter.has_headroom():
+        return None
+    delay = latency.p95() or policy.hedge_after
+    return delay if delay < budget else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in TRANSIENT_STATUS_CODES:
+        return True
+    name = type(exc).__name__
+    return "Timeout" in name or "Connection" in name or "RateLimit" in name
+
+
+async def _ainvoke_once(llm, messages, budget: float, hedge_after: Optional[float]):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    primary = asyncio.ensure_future(llm.ainvoke(messages))
+    attempts = [primary]
+    try:
+        if hedge_after:
+            done, _ = await asyncio.wait([primary], timeout=hedge_after)
+            if not done:
+                attempts.append(asyncio.ensure_future(llm.ainvoke(messages)))
+
+        pending = set(attempts)
+        error = None
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+
+        if error is not None and not pending:
+            raise error
+        raise asyncio.TimeoutError(f"LLM call exceeded its {budget:.1f}s budget")
+    finally:
+        # Cancel the losing hedge / timed-out attempt
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+async def ainvoke_with_resilience(llm, messages, policy: CallPolicy, model_name: str):
+    """
+    llm.ainvoke() with a latency budget, jittered retries on transient errors,
+    optional hedging and a circuit breaker. Non-transient errors (bad key,
+    bad request) are raised immediately; transient ones surface as
+    ProviderUnavailable once retries or the budget are exhausted.
+
+    policy.timeout is one deadline for the whole call: the rate-limit wait
+    and each attempt only get what is left of it, and no retry is started
+    that the remaining time can't cover.
+    """
+    breaker = get_breaker(model_name)
+    latency = get_latency_tracker(model_name)
+    limiter = get_rate_limiter(model_name)
+    estimated = estimate_tokens(messages)
+    deadline = time.monotonic() + policy.timeout
+    rate_limited = False
+    for attempt in range(policy.retries + 1):
+        if attempt and deadline - time.monotonic() < (latency.p95() or MIN_ATTEMPT_SECONDS):
+            break
+        if not breaker.allow():
+            raise ProviderUnavailable("LLM provider is degraded, try again shortly.")
+        try:
+            permit = await limiter.aacquire(policy.priority, estimated, max_wait=max(0.0, deadline - time.monotonic()))
+        except RateLimited as e:
+            breaker.release_probe()
+            raise ProviderUnavailable(str(e))
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        started = time.monotonic()
+        budget = deadline - started
+        if budget <= 0:
+            # Spent the whole budget queueing for the permit; that says nothing about the provider
+            limiter.release(permit)
+            breaker.release_probe()
+            break
+        try:
+            response = await _ainvoke_once(llm, messages, budget, _hedge_delay(policy, latency, limiter, budget))
+        except asyncio.CancelledError:
+            limiter.release(permit)
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            rate_limited = is_rate_limit(e)
+            limiter.release(permit, rate_limited=rate_limited, retry_after=retry_after_from(e))
+            limiter.observe_headers(headers_from(e))
+            if rate_limited:
+                # A 429 is backpressure, not an outage: the limiter pauses, the breaker stays closed
+                breaker.release_probe()
+                print(f"LLM rate limited (attempt {attempt + 1}): {e}")
+                continue
+            if not is_transient(e):
+                # The provider answered (bad key, bad request...): it is healthy
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            print(f"Transient LLM error (attempt {attempt + 1}): {e}")
+            if attempt < policy.retries:
+                await asyncio.sleep(min(policy.delay(attempt), max(0.0, deadline - time.monotonic())))
+            continue
+        limiter.release(permit, used_tokens=used_tokens_from(response))
+        breaker.record_success()
+        latency.record(time.monotonic() - started)
+        return response
+    if rate_limited:
+        raise ProviderUnavailable("LLM provider is rate limiting requests, try again shortly.")
+    raise ProviderUnavailable("LLM provider did not respond in time, try again shortly.")
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlmodel import Session, select, func
+
+from ..config import LLM_CACHE_MAX_ENTRIES
+from ..db.database import engine
+from ..db.models import LLMCacheEntry
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of parsed agent outputs.
+    Entries expire after their TTL; when the table grows past max_entries
+    the least recently used rows are evicted.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def hash_payload(payload: dict) -> str:
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_key(cls, role: str, model_name: str, messages: list) -> str:
+        return cls.hash_payload({
+            "role": role,
+            "model": model_name,
+            "messages": [
+                {"type": m.type, "content": m.content} for m in messages
+            ],
+        })
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key: str, ttl: int) -> Optional[Any]:
+        try:
+            with Session(engine) as session:
+                entry = session.get(LLMCacheEntry, key)
+                if not entry:
+                    self._count("misses")
+                    return None
+
+                now = datetime.utcnow()
+                if entry.created_at + timedelta(seconds=ttl) < now:
+                    session.delete(entry)
+                    session.commit()
+                    self._count("misses")
+                    return None
+
+                entry.last_accessed = now
+                entry.hits += 1
+                session.add(entry)
+                session.commit()
+                self._count("hits")
+                return json.loads(entry.response)
+        except Exception as e:
+            print(f"Cache read failed: {e}")
+            self._count("misses")
+            return None
+
+    def put(self, key: str, role: str, model_name: str, value: Any) -> None:
+        try:
+            with Session(engine) as session:
+                now = datetime.utcnow()
+                entry = session.get(LLMCacheEntry, key)
+                if not entry:
+                    entry = LLMCacheEntry(key=key, role=role, model_name=model_name, response="")
+                entry.response = json.dumps(value)
+                entry.created_at = now
+                entry.last_accessed = now
+                session.add(entry)
+                session.commit()
+                self._count("writes")
+                self._evict(session)
+        except Exception as e:
+            print(f"Cache write failed: {e}")
+
+    def _evict(self, session: Session) -> None:
+        total = session.exec(select(func.count()).select_from(LLMCacheEntry)).one()
+        overflow = total - self.max_entries
+        if overflow <= 0:
+            return
+
+        stale = session.exec(
+            select(LLMCacheEntry)
+            .order_by(LLMCacheEntry.last_accessed)
+            .limit(overflow)
+        ).all()
+        for entry in stale:
+            session.delete(entry)
+        session.commit()
+        with self._lock:
+            self.stats["evictions"] += len(stale)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache()
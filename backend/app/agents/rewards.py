@@ -0,0 +1,43 @@
+# Deterministic reward engine.
+# Mirrors the scoring rules in prompts/motivator_system.md so /verify can award
+# XP locally; the MotivatorAgent is only used for the flavour message.
+
+BASE_XP_PER_10_MIN = 10
+HARD_MODE_MINUTES = 45 # Tasks at or above this earn the "Hard Mode" badge
+MAX_STREAK_MULTIPLIER = 2.0
+
+
+def streak_multiplier(current_streak: int) -> float:
+    # +10% per consecutive success, capped at 2x
+    return min(1.0 + 0.1 * max(current_streak, 0), MAX_STREAK_MULTIPLIER)
+
+
+def quality_bonus(quality_score: int) -> int:
+    # 5-50 XP, only for high quality proof (>80)
+    if quality_score <= 80:
+        return 0
+    return min(50, 5 + (quality_score - 80) * 45 // 20)
+
+
+def calculate_rewards(estimated_time: int, quality_score: int, current_streak: int) -> dict:
+    minutes = max(int(estimated_time or 0), 1)
+    quality_score = max(0, min(int(quality_score or 0), 100))
+
+    base_xp = max(BASE_XP_PER_10_MIN * minutes // 10, 5)
+    multiplier = streak_multiplier(current_streak)
+    xp = int(round(base_xp * multiplier)) + quality_bonus(quality_score)
+
+    badge = None
+    if minutes >= HARD_MODE_MINUTES:
+        badge = "Hard Mode"
+    elif quality_score >= 95:
+        badge = "Deep Diver"
+
+    return {
+        "xp_gained": xp,
+        "base_xp": base_xp,
+        "streak_multiplier": multiplier,
+        "streak_bonus": multiplier > 1.0,
+        "badge": badge,
+        "message": None # Filled in later by the MotivatorAgent
+    }
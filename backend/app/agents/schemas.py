@@ -0,0 +1,131 @@
+import re
+from typing import Annotated, List, Optional
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, ValidationError, field_validator, model_validator
+
+# Expected output shapes for each agent (see prompts/*_system.md).
+# Validation is deliberately lenient: unknown keys are kept and most fields
+# are optional, since the endpoints already apply their own defaults. The
+# point is to reject structurally wrong output (e.g. "tasks" not a list).
+# One bad item in a list is dropped on its own instead of failing the lot.
+
+LEADING_NUMBER_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)")
+
+
+def _coerce_int(value):
+    # "20 min" -> 20, 20.5 -> 20, "soon" -> None: a sloppy number shouldn't cost the item
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    match = LEADING_NUMBER_RE.match(str(value))
+    return int(float(match.group(1))) if match else None
+
+
+LenientInt = Annotated[Optional[int], BeforeValidator(_coerce_int)]
+
+
+def _valid_items(model, items, label: str):
+    if not isinstance(items, list):
+        return items # Let the list type itself reject it
+    valid = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError as e:
+            print(f"Skipping malformed {label}: {e}")
+    return valid
+
+
+class AgentOutput(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class PlannedTask(AgentOutput):
+    title: str
+    group_id: Optional[str] = None
+    group_title: Optional[str] = None
+    step_order: LenientInt = None
+    target_date: Optional[str] = None
+    scheduled_time: Optional[str] = None
+    estimated_time: LenientInt = None
+    is_urgent: Optional[bool] = None
+    priority: Optional[str] = None
+    proof_instruction: Optional[str] = None
+    success_criteria: Optional[str] = None
+    minimum_viable_done: Optional[str] = None
+
+
+class PlanOutput(AgentOutput):
+    tasks: List[PlannedTask]
+
+    @field_validator("tasks", mode="before")
+    @classmethod
+    def drop_malformed_tasks(cls, value):
+        return _valid_items(PlannedTask, value, "planned task")
+
+
+class VerificationOutput(AgentOutput):
+    verdict: str
+    reason: Optional[str] = None
+    quality_score: LenientInt = None
+
+    @field_validator("verdict")
+    @classmethod
+    def normalize_verdict(cls, value: str) -> str:
+        value = value.strip().lower()
+        return value if value in ("pass", "partial", "retry") else "retry"
+
+
+class RewardOutput(AgentOutput):
+    xp_awarded: LenientInt = None
+    streak_bonus: Optional[bool] = None
+    badge: Optional[str] = None
+    message: Optional[str] = None
+
+
+class DebriefOutput(AgentOutput):
+    title: Optional[str] = None
+    analysis: str
+    strategy: Optional[str] = None
+    status: Optional[str] = None
+
+
+class MilestonePlan(AgentOutput):
+    title: str
+    description: Optional[str] = None
+    suggested_tasks: List[str] = []
+
+    @model_validator(mode="before")
+    @classmethod
+    def accept_tasks_key(cls, data):
+        # prompts/strategist_system.md calls the list "tasks"
+        if isinstance(data, dict) and "suggested_tasks" not in data and "tasks" in data:
+            data = {**data, "suggested_tasks": data["tasks"]}
+        return data
+
+    @field_validator("suggested_tasks", mode="before")
+    @classmethod
+    def flatten_tasks(cls, value):
+        # Models sometimes return task objects instead of plain titles
+        if not isinstance(value, list):
+            return value
+        return [item.get("title", "") if isinstance(item, dict) else item for item in value]
+
+
+class CampaignPlanOutput(AgentOutput):
+    campaign_title: str
+    recurrence_schedule: Optional[str] = None
+    milestones: List[MilestonePlan]
+
+    @field_validator("milestones", mode="before")
+    @classmethod
+    def drop_malformed_milestones(cls, value):
+        return _valid_items(MilestonePlan, value, "milestone")
+
+
+def validate_output(schema, data: dict) -> dict:
+    # Agents may legitimately answer with {"error": "..."} (e.g. vague goal)
+    if schema is None or "error" in data:
+        return data
+    return schema.model_validate(data).model_dump(exclude_none=True)
@@ -0,0 +1,30 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key does the
+    work, everyone arriving while it is in flight waits for and shares its
+    result (or exception). Nothing is remembered once the call completes;
+    that's what the response cache is for.
+    """
+
+    def __init__(self):
+        # Only touched from the event loop, so no lock needed
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _t: self._tasks.pop(key, None))
+        # shield: one impatient client disconnecting must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+
+llm_flights = SingleFlight()
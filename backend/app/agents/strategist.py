@@ -1,17 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Any, Dict, Optional
 
 from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from ..config import STRATEGIST_RESEARCH_BUDGET
 from ..tools.youtube import youtube_playlist_curriculum_search
 from .base import BaseAgent
+from .response_cache import response_cache
+from .singleflight import llm_flights
+from .rate_limit import PRIORITY_PLANNING
+from .resilience import CallPolicy, ProviderUnavailable
+from .schemas import CampaignPlanOutput
+
+# Shared across requests: research calls are blocking network I/O
+_research_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="strategist-research")
 
 
 class StrategistAgent(BaseAgent):
+    output_schema = CampaignPlanOutput
+    call_policy = CallPolicy(timeout=60, retries=1, priority=PRIORITY_PLANNING)
     def __init__(self):
         super().__init__(role="strategist")
         self.search_tool = DuckDuckGoSearchRun()
@@ -19,7 +32,8 @@ class StrategistAgent(BaseAgent):
 
     def _run_youtube_curriculum(self, user_goal: str) -> Dict[str, Any]:
         try:
-            raw = youtube_playlist_curriculum_search(topic=user_goal)
+            # StructuredTool objects aren't callable; go through the Runnable interface
+            raw = youtube_playlist_curriculum_search.invoke({"topic": user_goal})
             if isinstance(raw, dict):
                 return raw
             return json.loads(str(raw))
@@ -36,56 +50,77 @@ class StrategistAgent(BaseAgent):
                 return f"Search failed for query '{query}': {e}"
 
     def _parse_json_robust(self, text: str) -> Dict[str, Any]:
-        cleaned = self._clean_json_text(text)
-        try:
-            return json.loads(cleaned)
-        except Exception:
-            match = re.search(r"\{.*\}", cleaned, re.DOTALL)
-            if match:
-                try:
-                    return json.loads(match.group(0))
-                except Exception:
-                    pass
-            raise
-
-    def generate_campaign_plan(self, user_goal: str, user_profile: Optional[dict]) -> dict:
-        if not self.llm:
-            return {"error": "API Key Missing. Please go to Settings."}
-
-        user_profile = user_profile or {}
+        # Tolerant local parse + schema check; raises only if both fail,
+        # which is when the caller falls back to an LLM repair round trip
+        return self._parse_response(text)
+
+    def _gather_research(self, user_goal: str) -> Dict[str, Any]:
+        """
+        Fire the YouTube curriculum lookup and both DuckDuckGo searches at once
+        and collect whatever has returned within STRATEGIST_RESEARCH_BUDGET.
+        A usable syllabus wins as soon as it arrives; otherwise the search
+        results are used. Stragglers are cancelled (or, if already running,
+        abandoned and their results ignored).
+        """
+        queries = [
+            f"curriculum for {user_goal}",
+            f"how to {user_goal} roadmap",
+        ]
+        youtube_future = _research_pool.submit(self._run_youtube_curriculum, user_goal)
+        search_futures = {_research_pool.submit(self._run_search, q): q for q in queries}
+
+        pending = {youtube_future, *search_futures}
+        deadline = time.monotonic() + STRATEGIST_RESEARCH_BUDGET
+        youtube_curriculum = None
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if youtube_future in done:
+                youtube_curriculum = youtube_future.result()
+                syllabus = youtube_curriculum.get("syllabus") if isinstance(youtube_curriculum, dict) else None
+                if isinstance(syllabus, list) and len(syllabus) > 0:
+                    break
+
+        for future in pending:
+            future.cancel()
+        if pending and time.monotonic() >= deadline:
+            print(f"Research budget hit, dropped {len(pending)} source(s)")
 
-        youtube_curriculum = self._run_youtube_curriculum(user_goal)
         syllabus = youtube_curriculum.get("syllabus") if isinstance(youtube_curriculum, dict) else None
+        if isinstance(syllabus, list) and len(syllabus) > 0:
+            return {
+                "research": [
+                    {
+                        "source": "youtube_playlist_curriculum_search",
+                        "raw": youtube_curriculum,
+                    }
+                ]
+            }
 
         research_blocks = []
-        if isinstance(syllabus, list) and len(syllabus) > 0:
+        for future, q in search_futures.items():
+            results = future.result() if future.done() and not future.cancelled() else ""
             research_blocks.append(
                 {
-                    "source": "youtube_playlist_curriculum_search",
-                    "raw": youtube_curriculum,
+                    "source": "duckduckgo",
+                    "query": q,
+                    "results": results,
                 }
             )
-        else:
-            queries = [
-                f"curriculum for {user_goal}",
-                f"how to {user_goal} roadmap",
-            ]
-            for q in queries:
-                research_blocks.append(
-                    {
-                        "source": "duckduckgo",
-                        "query": q,
-                        "results": self._run_search(q),
-                    }
-                )
 
-            ddg_results = [b.get("results") for b in research_blocks]
-            ddg_failed = all((not r) or str(r).lower().startswith("search failed") for r in ddg_results)
-            if ddg_failed:
-                return {
-                    "error": "I couldn't find a good curriculum for that goal. Please make the topic more specific (e.g., 'Python for data analysis', 'React basics', 'Guitar blues basics')."
-                }
+        ddg_results = [b.get("results") for b in research_blocks]
+        ddg_failed = all((not r) or str(r).lower().startswith("search failed") for r in ddg_results)
+        if ddg_failed:
+            return {
+                "error": "I couldn't find a good curriculum for that goal. Please make the topic more specific (e.g., 'Python for data analysis', 'React basics', 'Guitar blues basics')."
+            }
 
+        return {"research": research_blocks}
+
+    def _build_messages(self, user_goal: str, user_profile: dict, research_blocks: list) -> list:
         strategist_system_prompt = (
             "You are a Grand Strategist. Your job is to turn a vague goal into a structured campaign plan.\n"
             "You must output valid JSON only (no markdown, no code fences, no commentary).\n\n"
@@ -127,29 +162,63 @@ class StrategistAgent(BaseAgent):
             SystemMessage(content=strategist_system_prompt),
             HumanMessage(content=strategist_user_prompt),
         ]
+        return messages
+
+    def _build_repair_messages(self, raw_content: str) -> list:
+        repair_messages = [
+            SystemMessage(
+                content=(
+                    "You are a JSON repair tool. Convert the input into valid JSON only. "
+                    "Output JSON only with keys: campaign_title, recurrence_schedule, milestones."
+                )
+            ),
+            HumanMessage(
+                content=(
+                    "Repair the following into valid JSON only.\n\n"
+                    "INPUT:\n"
+                    f"{raw_content}"
+                )
+            ),
+        ]
+        return repair_messages
+
+    def _flight_key_for(self, user_goal: str, user_profile: dict) -> str:
+        return response_cache.hash_payload({"role": self.role, "goal": user_goal, "profile": user_profile})
 
+    async def agenerate_campaign_plan(self, user_goal: str, user_profile: Optional[dict]) -> dict:
+        user_profile = user_profile or {}
+        # Double-fired requests share one research + LLM round trip
+        return await llm_flights.ado(
+            self._flight_key_for(user_goal, user_profile),
+            lambda: self._agenerate_campaign_plan(user_goal, user_profile)
+        )
+
+    async def _agenerate_campaign_plan(self, user_goal: str, user_profile: dict) -> dict:
+        if not self.llm:
+            return {"error": "API Key Missing. Please go to Settings."}
+
+        # Research fans out on the research pool; wait for it off the loop
+        research = await asyncio.to_thread(self._gather_research, user_goal)
+        if "error" in research:
+            return research
+
+        messages = self._build_messages(user_goal, user_profile, research["research"])
+
+        try:
+            response = await self._ainvoke(messages)
+        except ProviderUnavailable as e:
+            return self._provider_error(e)
+        except Exception as e:
+            return {"error": str(e)}
+
+        raw_content = str(response.content)
         try:
-            response = self.llm.invoke(messages)
-            raw_content = str(response.content)
             return self._parse_json_robust(raw_content)
-        except Exception:
-            repair_messages = [
-                SystemMessage(
-                    content=(
-                        "You are a JSON repair tool. Convert the input into valid JSON only. "
-                        "Output JSON only with keys: campaign_title, recurrence_schedule, milestones."
-                    )
-                ),
-                HumanMessage(
-                    content=(
-                        "Repair the following into valid JSON only.\n\n"
-                        "INPUT:\n"
-                        f"{locals().get('raw_content', '')}"
-                    )
-                ),
-            ]
-            try:
-                response = self.llm.invoke(repair_messages)
-                return self._parse_json_robust(str(response.content))
-            except Exception as e:
-                return {"error": str(e)}
+        except Exception as e:
+            print(f"Local JSON repair failed ({e}), asking the model to repair")
+
+        try:
+            response = await self._ainvoke(self._build_repair_messages(raw_content))
+            return self._parse_json_robust(str(response.content))
+        except Exception as e:
+            return {"error": str(e)}
@@ -1,74 +1,117 @@
+import asyncio
+from typing import Optional, Union
+
 from .base import BaseAgent
+from .rate_limit import PRIORITY_INTERACTIVE
+from .resilience import CallPolicy, ProviderUnavailable
+from .schemas import VerificationOutput
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_groq import ChatGroq
-import os
-import json
+from .llm_registry import get_llm, VISION_MODEL
+from .proof_image import PreparedImage, prepare_proof_image
+from .response_cache import response_cache
+
+# Returned when the proof image itself is unusable (undecodable), which is on the user
+VISION_FAILURE = {
+    "verdict": "retry",
+    "reason": "Vision analysis failed. Please provide more text detail.",
+    "quality_score": 0
+}
 
 class VerifierAgent(BaseAgent):
+    output_schema = VerificationOutput
+    call_policy = CallPolicy(timeout=20, retries=2, hedge=True, hedge_after=6, priority=PRIORITY_INTERACTIVE)
+    vision_call_policy = CallPolicy(timeout=30, retries=2, hedge=True, hedge_after=10, priority=PRIORITY_INTERACTIVE)
+    cache_ttl = 86400 # Resubmitting the same text proof gets the same verdict
+
     def __init__(self):
         super().__init__(role="verifier")
         # Specialized Vision Model
-        self.vision_llm = ChatGroq(
-            temperature=0, 
-            model_name="meta-llama/llama-4-scout-17b-16e-instruct", 
-            api_key=os.getenv("GROQ_API_KEY")
-        )
-
-    def verify_task(self, task_title: str, success_criteria: str, user_proof: str, image_data: str = None) -> dict:
-        
-        # 1. Text-Only Verification (The Old Way)
-        if not image_data:
-            context = {
-                "task_title": task_title,
-                "required_criteria": success_criteria,
-                "user_provided_proof": user_proof
-            }
-            return self.run(f"Verify this work: {user_proof}", context)
+        self.vision_llm = get_llm(self.api_key, model_name=VISION_MODEL)
 
-        # 2. Vision Verification (The New Way)
+    def _build_text_context(self, task_title: str, success_criteria: str, user_proof: str) -> dict:
+        return {
+            "task_title": task_title,
+            "required_criteria": success_criteria,
+            "user_provided_proof": user_proof
+        }
+
+    def _build_vision_messages(self, task_title: str, success_criteria: str, user_proof: str, image_b64: str) -> list:
         # We manually construct the multimodal message for Llama Vision
-        print("DEBUG: Engaged Vision Model")
-        
         system_prompt = self._load_prompt("verifier_system")
         prompt_text = f"""
         TASK: {task_title}
         CRITERIA: {success_criteria}
         USER NOTE: {user_proof}
-        
+
         Analyze the image provided. Does it provide evidence that the task is completed according to the criteria?
         If the image is irrelevant to the task, reject it.
-        
+
         Output valid JSON only.
         """
 
-        messages = [
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(content=[
                 {"type": "text", "text": prompt_text},
                 {
-                    "type": "image_url", 
-                    "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/jpeg;base64,{image_b64}"}
                 }
             ])
         ]
 
+    def _vision_cache_key(self, task_id: Optional[str], task_title: str, success_criteria: str, image: PreparedImage) -> Optional[str]:
+        # Same image for the same task -> same verdict, whatever the note says
+        if not self.cache_ttl:
+            return None
+        return response_cache.hash_payload({
+            "role": "verifier_vision",
+            "model": VISION_MODEL,
+            "task": task_id or task_title,
+            "criteria": success_criteria,
+            "image": image.content_hash,
+        })
+
+    def _prepare_image(self, image_data: Union[str, bytes]) -> Optional[PreparedImage]:
+        try:
+            return prepare_proof_image(image_data)
+        except Exception as e:
+            print(f"Proof image rejected: {e}")
+            return None
+
+    async def averify_task(self, task_title: str, success_criteria: str, user_proof: str, image_data: Union[str, bytes] = None, task_id: str = None) -> dict:
+        # 1. Text-Only Verification (The Old Way)
+        if not image_data:
+            context = self._build_text_context(task_title, success_criteria, user_proof)
+            return await self.arun(f"Verify this work: {user_proof}", context)
+
+        # 2. Vision Verification (The New Way)
+        print("DEBUG: Engaged Vision Model")
+        if not self.vision_llm:
+            return {"error": "API Key Missing. Please go to Settings."}
+
+        # Decoding/resizing is CPU bound, keep it off the event loop
+        image = await asyncio.to_thread(self._prepare_image, image_data)
+        if not image:
+            return dict(VISION_FAILURE)
+
+        cache_key = self._vision_cache_key(task_id, task_title, success_criteria, image)
+        cached = await asyncio.to_thread(response_cache.get, cache_key, self.cache_ttl) if cache_key else None
+        if cached is not None:
+            return cached
+
+        messages = self._build_vision_messages(task_title, success_criteria, user_proof, image.b64)
+
         try:
-            response = self.vision_llm.invoke(messages)
-            content = response.content
-            
-            # Clean json (reuse the logic from BaseAgent manually or via helper)
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "{" in content:
-                start = content.find("{")
-                end = content.rfind("}") + 1
-                content = content[start:end]
-            
-            return json.loads(content)
+            response = await self._ainvoke(messages, self.vision_llm, VISION_MODEL, self.vision_call_policy)
+            result = self._parse_response(response.content)
+        except ProviderUnavailable as e:
+            print(f"Vision provider unavailable: {e}")
+            return self._provider_error(e)
         except Exception as e:
+            # Not a judgement on the proof, so it must not count as a failed attempt
             print(f"Vision Error: {e}")
-            return {
-                "verdict": "retry", 
-                "reason": "Vision analysis failed. Please provide more text detail.", 
-                "quality_score": 0
-            }
\ No newline at end of file
+            return {"error": f"Vision analysis failed: {e}"}
+
+        await asyncio.to_thread(self._cache_store, cache_key, result, VISION_MODEL)
+        return result
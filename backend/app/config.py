@@ -0,0 +1,58 @@
+import os
+
+# Runtime tunables. Everything can be overridden with an environment variable
+# so the packaged app and local dev runs can share one codebase.
+
+# --- LLM response cache ---
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("KRYTA_LLM_CACHE_MAX_ENTRIES", "500"))
+# Seconds, for agents that opt into the cache without a lifetime of their own (reflector)
+LLM_CACHE_DEFAULT_TTL = int(os.getenv("KRYTA_LLM_CACHE_TTL", "3600"))
+
+# --- Proof image preprocessing (before vision calls) ---
+PROOF_IMAGE_MAX_DIMENSION = int(os.getenv("KRYTA_PROOF_IMAGE_MAX_DIM", "1568")) # px, longest side
+PROOF_IMAGE_TARGET_BYTES = int(os.getenv("KRYTA_PROOF_IMAGE_TARGET_BYTES", "512000"))
+
+# --- Multipart proof uploads (/verify/upload) ---
+PROOF_UPLOAD_MAX_BYTES = int(os.getenv("KRYTA_PROOF_UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# --- Strategist research ---
+STRATEGIST_RESEARCH_BUDGET = float(os.getenv("KRYTA_RESEARCH_BUDGET_SECONDS", "8"))
+
+# --- YouTube curriculum cache ---
+CURRICULUM_CACHE_TTL = int(os.getenv("KRYTA_CURRICULUM_CACHE_TTL", str(7 * 24 * 3600))) # fresh
+CURRICULUM_CACHE_STALE_TTL = int(os.getenv("KRYTA_CURRICULUM_CACHE_STALE_TTL", str(30 * 24 * 3600))) # served while refreshing
+CURRICULUM_NEGATIVE_TTL = int(os.getenv("KRYTA_CURRICULUM_NEGATIVE_TTL", str(24 * 3600)))
+
+# --- Groq client-side rate limiting (per model) ---
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("KRYTA_GROQ_RPM", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("KRYTA_GROQ_TPM", "30000"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("KRYTA_GROQ_MAX_CONCURRENCY", "8"))
+
+# --- Reflector (weekly debrief) context ---
+REFLECTOR_CONTEXT_TOKEN_BUDGET = int(os.getenv("KRYTA_REFLECTOR_TOKEN_BUDGET", "600"))
+
+# --- Idempotency-Key replay window for write endpoints ---
+IDEMPOTENCY_TTL = int(os.getenv("KRYTA_IDEMPOTENCY_TTL", str(24 * 3600)))
+
+# --- SQLite database ---
+# Relative paths are resolved once at startup, not against whatever the CWD is later
+DATABASE_PATH = os.path.abspath(os.getenv("KRYTA_DB_PATH", "todo.db"))
+DB_POOL_SIZE = int(os.getenv("KRYTA_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("KRYTA_DB_MAX_OVERFLOW", "20"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("KRYTA_DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.getenv("KRYTA_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv("KRYTA_DB_CACHE_SIZE_KB", "65536")) # per connection
+
+# --- Current-user / settings context cache ---
+# Writes through the API invalidate it; the TTL only bounds staleness from out-of-band DB edits
+CONTEXT_CACHE_TTL = int(os.getenv("KRYTA_CONTEXT_CACHE_TTL", "300"))
+
+# --- Hot/cold task archival ---
+# Completed tasks older than this move from `task` to `task_archive`
+TASK_ARCHIVE_AFTER_DAYS = max(30, int(os.getenv("KRYTA_TASK_ARCHIVE_AFTER_DAYS", "90"))) # >= reflector/heatmap windows
+TASK_ARCHIVE_INTERVAL = int(os.getenv("KRYTA_TASK_ARCHIVE_INTERVAL", str(6 * 3600))) # seconds between runs
+TASK_ARCHIVE_BATCH_SIZE = int(os.getenv("KRYTA_TASK_ARCHIVE_BATCH_SIZE", "500"))
+
+# --- HTTP responses ---
+COMPRESSION_MIN_BYTES = int(os.getenv("KRYTA_COMPRESSION_MIN_BYTES", "1024")) # smaller bodies go out uncompressed
@@ -0,0 +1,116 @@
+import argparse
+import threading
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from sqlalchemy import literal, union_all
+from sqlmodel import Session, select
+
+from ..config import TASK_ARCHIVE_AFTER_DAYS, TASK_ARCHIVE_BATCH_SIZE, TASK_ARCHIVE_INTERVAL
+from .database import engine
+from .models import Task, TaskArchive, TaskBase
+from .versioning import bump_statement
+
+# Hot/cold split for tasks. Completed tasks past the horizon move to
+# task_archive so `task` stays sized by active work. Nothing reading the hot
+# table needs them: analytics come from daily_stats (rollups include archived
+# rows on backfill), streaks live on User, and the reflector looks at 7 days.
+# History views read both tables through task_history().
+
+TASK_COLUMNS = list(TaskBase.model_fields)
+_archiver_started = False
+_archiver_lock = threading.Lock()
+
+
+def archive_completed_tasks(older_than_days: int = TASK_ARCHIVE_AFTER_DAYS, batch_size: int = TASK_ARCHIVE_BATCH_SIZE) -> int:
+    """Move completed tasks created and due before the horizon. Returns how many moved."""
+    cutoff_day = date.today() - timedelta(days=older_than_days)
+    cutoff = datetime.combine(cutoff_day, time.min)
+    columns = ", ".join(TASK_COLUMNS)
+    moved = 0
+
+    while True:
+        # Small batches keep each write transaction (and the WAL) short
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(Task.id, Task.user_id)
+                .where(Task.status == "completed")
+                .where(Task.created_at < cutoff)
+                .where(Task.target_date < cutoff_day)
+                .limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            ids = [row[0] for row in rows]
+
+            placeholders = ", ".join("?" for _ in ids)
+            conn.exec_driver_sql(
+                f"INSERT OR REPLACE INTO task_archive ({columns}, archived_at) "
+                f"SELECT {columns}, ? FROM task WHERE id IN ({placeholders})",
+                (datetime.utcnow().isoformat(sep=" "), *ids)
+            )
+            conn.exec_driver_sql(f"DELETE FROM task WHERE id IN ({placeholders})", tuple(ids))
+            # History rows now report archived=true, so cached history ETags must change
+            for user_id in {row[1] for row in rows}:
+                conn.execute(bump_statement(user_id))
+        moved += len(ids)
+
+    if moved:
+        print(f"Archived {moved} completed tasks older than {older_than_days} days")
+    return moved
+
+
+def task_history(session: Session, user_id: str, start: Optional[date] = None, end: Optional[date] = None, limit: int = 100, offset: int = 0, columns: Optional[List[str]] = None) -> List[dict]:
+    """Hot and archived tasks for a user, newest first, optionally within [start, end] by target_date."""
+    columns = columns or TASK_COLUMNS
+    ordering_only = "created_at" not in columns
+    if ordering_only:
+        columns = columns + ["created_at"] # Needed for ordering the union
+
+    def scoped(model, archived: bool):
+        query = select(*[getattr(model, c) for c in columns], literal(archived).label("archived"))
+        query = query.where(model.user_id == user_id)
+        if start:
+            query = query.where(model.target_date >= start)
+        if end:
+            query = query.where(model.target_date <= end)
+        return query
+
+    history = union_all(scoped(Task, False), scoped(TaskArchive, True)).subquery()
+    rows = session.execute(
+        select(history).order_by(history.c.created_at.desc()).limit(limit).offset(offset)
+    ).mappings().all()
+    if ordering_only:
+        return [{k: v for k, v in row.items() if k != "created_at"} for row in rows]
+    return [dict(row) for row in rows]
+
+
+def _archive_loop(interval: int) -> None:
+    while True:
+        try:
+            archive_completed_tasks()
+        except Exception as e:
+            print(f"Task archival failed: {e}")
+        time_module.sleep(interval)
+
+
+def start_archiver(interval: int = TASK_ARCHIVE_INTERVAL) -> None:
+    """Run archival now and then every `interval` seconds on a daemon thread (idempotent)."""
+    global _archiver_started
+    with _archiver_lock:
+        if _archiver_started:
+            return
+        _archiver_started = True
+    threading.Thread(target=_archive_loop, args=(interval,), daemon=True, name="task-archiver").start()
+
+
+if __name__ == "__main__":
+    # python -m app.db.archive [--days N]
+    parser = argparse.ArgumentParser(description="Move old completed tasks to task_archive")
+    parser.add_argument("--days", type=int, default=TASK_ARCHIVE_AFTER_DAYS, help="archive horizon in days")
+    args = parser.parse_args()
+
+    from .database import init_db
+    init_db()
+    print(f"Moved {archive_completed_tasks(args.days)} tasks to task_archive")
@@ -0,0 +1,26 @@
+from typing import Dict, List, Sequence
+
+from sqlalchemy import insert
+from sqlmodel import Session, SQLModel
+
+# Batch writes for freshly built model instances (planner output, campaign
+# confirmation). Ids and defaults are generated client-side by the models'
+# default_factory, so the rows are complete before they reach SQLite: one
+# executemany INSERT per table, no per-row flush and no refresh afterwards.
+
+
+def bulk_insert(session: Session, rows: Sequence[SQLModel]) -> List[dict]:
+    """
+    Insert rows in the session's current transaction (caller commits) and
+    return their column dicts, in input order, for building the response.
+    Rows are not attached to the session.
+    """
+    payloads = [row.model_dump() for row in rows]
+    by_table: Dict[type, List[dict]] = {}
+    for row, payload in zip(rows, payloads):
+        by_table.setdefault(type(row), []).append(payload)
+
+    # Parents before children: callers pass rows in dependency order
+    for model, table_rows in by_table.items():
+        session.execute(insert(model.__table__), table_rows)
+    return payloads
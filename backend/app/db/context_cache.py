@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config import CONTEXT_CACHE_TTL
+from .database import engine
+from .models import AppSettings, User
+
+# Kryta is single-user: nearly every request re-reads the same User row and the
+# groq_api_key setting. Both are cached here in-process and dropped by the
+# endpoints that write them (/user/onboard, /verify, /settings/key, /dashboard
+# when it creates the user).
+
+
+class ContextCache:
+    def __init__(self, ttl: int = CONTEXT_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._user: Optional[Tuple[float, Optional[dict]]] = None
+        self._settings: Dict[str, Tuple[float, Optional[str]]] = {}
+        # Bumped on every invalidation. A read that started before an
+        # invalidation must not store its (possibly stale) result afterwards.
+        self._user_generation = 0
+        self._settings_generation: Dict[str, int] = {}
+
+    def _fresh(self, entry: Optional[Tuple[float, Any]]) -> bool:
+        return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    def _user_data(self, session: Session) -> Optional[dict]:
+        with self._lock:
+            entry = self._user
+            generation = self._user_generation
+        if self._fresh(entry):
+            return entry[1]
+
+        user = session.exec(select(User)).first()
+        data = user.model_dump() if user else None
+        with self._lock:
+            if generation == self._user_generation:
+                self._user = (time.monotonic(), data)
+        return data
+
+    def get_user(self, session: Session) -> Optional[User]:
+        """Detached, read-only copy of the current user. Never add it to a session."""
+        data = self._user_data(session)
+        return User.model_validate(data) if data else None
+
+    def get_user_for_update(self, session: Session) -> Optional[User]:
+        """Session-bound user for endpoints that modify it (primary key lookup)."""
+        data = self._user_data(session)
+        return session.get(User, data["id"]) if data else None
+
+    # Async twins for AsyncSession endpoints: a cache hit does no I/O at all,
+    # a miss runs the same lookup through the session's greenlet bridge.
+    def _cached_user(self) -> Tuple[bool, Optional[dict]]:
+        with self._lock:
+            entry = self._user
+        return (True, entry[1]) if self._fresh(entry) else (False, None)
+
+    async def aget_user(self, session: AsyncSession) -> Optional[User]:
+        hit, data = self._cached_user()
+        if not hit:
+            data = await session.run_sync(self._user_data)
+        return User.model_validate(data) if data else None
+
+    async def aget_user_for_update(self, session: AsyncSession) -> Optional[User]:
+        hit, data = self._cached_user()
+        if not hit:
+            data = await session.run_sync(self._user_data)
+        return await session.get(User, data["id"]) if data else None
+
+    def invalidate_user(self) -> None:
+        with self._lock:
+            self._user = None
+            self._user_generation += 1
+
+    def get_setting(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._settings.get(key)
+            generation = self._settings_generation.get(key, 0)
+        if self._fresh(entry):
+            return entry[1]
+
+        value = None
+        try:
+            with Session(engine) as session:
+                setting = session.get(AppSettings, key)
+                value = setting.value if setting and setting.value else None
+        except Exception:
+            return None
+        with self._lock:
+            if generation == self._settings_generation.get(key, 0):
+                self._settings[key] = (time.monotonic(), value)
+        return value
+
+    async def aget_setting(self, key: str) -> Optional[str]:
+        # Hit: no I/O. Miss: the sync lookup runs on a worker thread, not the event loop
+        with self._lock:
+            entry = self._settings.get(key)
+        if self._fresh(entry):
+            return entry[1]
+        return await asyncio.to_thread(self.get_setting, key)
+
+    def invalidate_setting(self, key: str) -> None:
+        with self._lock:
+            self._settings.pop(key, None)
+            self._settings_generation[key] = self._settings_generation.get(key, 0) + 1
+
+
+context_cache = ContextCache()
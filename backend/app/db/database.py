@@ -1,41 +1,79 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool
 from sqlmodel import SQLModel, create_engine, Session
-from typing import Generator
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import AsyncGenerator, Generator
+from ..config import (
+    DATABASE_PATH, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_BUSY_TIMEOUT_MS, DB_MMAP_SIZE, DB_CACHE_SIZE_KB,
+)
+from .migrations import run_migrations
 
-# 1. Define the database file path (creates 'todo.db' in the root folder)
-sqlite_file_name = "todo.db"
+# 1. Database file path (KRYTA_DB_PATH, defaults to 'todo.db' in the launch folder)
+sqlite_file_name = DATABASE_PATH
 sqlite_url = f"sqlite:///{sqlite_file_name}"
+async_sqlite_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
 
 # 2. Create the engine
 # connect_args={"check_same_thread": False} is CRITICAL for SQLite + FastAPI 
 # because FastAPI runs in multiple threads, but SQLite usually prefers one.
+# Each worker thread checks out its own pooled connection.
 engine = create_engine(
     sqlite_url, 
     echo=False, # Set to True if you want to see SQL queries in the console
-    connect_args={"check_same_thread": False} 
+    connect_args={
+        "check_same_thread": False,
+        "timeout": DB_BUSY_TIMEOUT_MS / 1000 # pysqlite's own wait on a locked database
+    },
+    poolclass=QueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW
+)
+
+# 2a. Async engine on the same file for async endpoints.
+# aiosqlite runs each connection on its own thread, so awaiting a query
+# never blocks the event loop.
+async_engine = create_async_engine(
+    async_sqlite_url,
+    echo=False,
+    connect_args={"timeout": DB_BUSY_TIMEOUT_MS / 1000},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW
 )
 
+# 2b. Per-connection tuning, applied to every new pooled connection.
+# WAL lets readers (dashboard, calendar) run while /verify or /plan is writing;
+# writers then only contend with each other, waiting up to busy_timeout.
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL") # Durable in WAL mode, skips an fsync per commit
+        cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}") # negative = KiB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
 # 3. Initialization function (Creates tables based on your models)
 def init_db():
     # This looks at all imported SQLModel classes and creates tables
     SQLModel.metadata.create_all(engine)
 
-    with engine.begin() as conn:
-        try:
-            cols = conn.exec_driver_sql("PRAGMA table_info('task')").fetchall()
-            existing = {row[1] for row in cols}
-
-            if "group_id" not in existing:
-                conn.exec_driver_sql("ALTER TABLE task ADD COLUMN group_id TEXT")
-            if "group_title" not in existing:
-                conn.exec_driver_sql("ALTER TABLE task ADD COLUMN group_title TEXT")
-            if "step_order" not in existing:
-                conn.exec_driver_sql("ALTER TABLE task ADD COLUMN step_order INTEGER")
-                conn.exec_driver_sql("UPDATE task SET step_order = 1 WHERE step_order IS NULL")
-        except Exception:
-            pass
+    # Bring existing databases up to date (columns, indexes) - see db/migrations.py
+    run_migrations(engine)
 
 # 4. Dependency for FastAPI
 # This allows you to use: def endpoint(session: Session = Depends(get_session))
 def get_session() -> Generator[Session, None, None]:
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+# 5. Async dependency: def endpoint(session: AsyncSession = Depends(get_async_session))
+# expire_on_commit=False so rows can still be serialized after commit without
+# an implicit (sync) reload. Sync helpers run against it via session.run_sync().
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
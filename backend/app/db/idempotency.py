@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlmodel import Session, delete
+
+from ..config import IDEMPOTENCY_TTL
+from ..agents.singleflight import SingleFlight
+from ..responses import dumps
+from .database import engine
+from .models import IdempotencyRecord
+
+# Write endpoints accept an `Idempotency-Key` header. The first response for a
+# key is stored; a replay (frontend retry, double click) gets that response back
+# instead of inserting the same tasks/campaign again. Requests racing with the
+# same key are coalesced in-process so only one of them executes.
+# Each record also keeps a hash of the request body: reusing a key for a
+# different body is a client bug and gets a 422 instead of someone else's
+# response. Keyless requests with an identical body that arrive while one
+# is running share its result too (double submit from a client without keys).
+
+_flights = SingleFlight()
+# record key -> request hash of the call currently executing under that key
+_running: Dict[str, str] = {}
+# Failed attempts aren't recorded so the client can retry them for real
+NOT_REPLAYED_STATUSES = {"error", "unavailable"}
+
+
+def _record_key(endpoint: str, key: str) -> str:
+    return f"{endpoint}:{key}"
+
+
+def request_hash(payload: Any) -> str:
+    """Stable fingerprint of a request body (bytes, e.g. uploaded images, are hashed first)."""
+    def default(obj):
+        if isinstance(obj, (bytes, bytearray)):
+            return hashlib.sha256(obj).hexdigest()
+        return str(obj)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=default).encode()).hexdigest()
+
+
+def _conflict() -> HTTPException:
+    return HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+
+def _lookup(record_key: str) -> Tuple[Optional[str], Optional[Any]]:
+    """Returns (request_hash, response) of a live record, or (None, None)."""
+    try:
+        with Session(engine) as session:
+            record = session.get(IdempotencyRecord, record_key)
+            if not record:
+                return None, None
+            if record.created_at + timedelta(seconds=IDEMPOTENCY_TTL) < datetime.utcnow():
+                return None, None
+            return record.request_hash, json.loads(record.response)
+    except Exception as e:
+        print(f"Idempotency lookup failed: {e}")
+        return None, None
+
+
+def _store(record_key: str, endpoint: str, fingerprint: Optional[str], result: Any) -> None:
+    if isinstance(result, dict) and result.get("status") in NOT_REPLAYED_STATUSES:
+        return
+    try:
+        with Session(engine) as session:
+            cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL)
+            session.exec(delete(IdempotencyRecord).where(IdempotencyRecord.created_at < cutoff))
+            session.merge(IdempotencyRecord(
+                key=record_key,
+                endpoint=endpoint,
+                request_hash=fingerprint,
+                response=dumps(result).decode() # Same encoding as the live response, so replays match it
+            ))
+            session.commit()
+    except Exception as e:
+        print(f"Idempotency store failed: {e}")
+
+
+async def arun_idempotent(key: Optional[str], endpoint: str, handler: Callable[[], Awaitable[Any]], fingerprint: Optional[str] = None) -> Any:
+    """
+    Run handler() once per (endpoint, key); replays return the stored response.
+    `fingerprint` is request_hash() of the body: a key replayed with a different
+    body is rejected with 422, and keyless identical requests are coalesced.
+    """
+    if not key:
+        if not fingerprint:
+            return await handler()
+        return await _flights.ado(f"{endpoint}#{fingerprint}", handler)
+
+    record_key = _record_key(endpoint, key)
+    if record_key in _running:
+        # Same key already executing: join it only if it is the same request
+        running = _running[record_key]
+        if running and fingerprint and running != fingerprint:
+            raise _conflict()
+    else:
+        _running[record_key] = fingerprint
+
+    async def execute():
+        try:
+            # Record reads/writes are small sync queries; keep them off the event loop
+            stored_hash, stored = await asyncio.to_thread(_lookup, record_key)
+            if stored is not None:
+                if stored_hash and fingerprint and stored_hash != fingerprint:
+                    raise _conflict()
+                return stored
+            result = await handler()
+            await asyncio.to_thread(_store, record_key, endpoint, fingerprint, result)
+            return result
+        finally:
+            _running.pop(record_key, None)
+
+    return await _flights.ado(record_key, execute)
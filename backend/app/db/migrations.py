@@ -0,0 +1,120 @@
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy.engine import Connection
+
+from .rollups import backfill
+
+# Versioned schema migrations for existing user databases.
+# create_all() builds fresh databases from models.py; every migration here
+# must therefore also be a no-op on a schema that is already up to date
+# (check columns before ALTER, use IF NOT EXISTS for indexes).
+# Append new migrations with the next version number, never edit applied ones.
+
+Migration = Tuple[int, str, Callable[[Connection], None]]
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info('{table}')").fetchall()}
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> bool:
+    if column in _columns(conn, table):
+        return False
+    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return True
+
+
+# --- Migrations ---
+
+@migration(1, "task grouping columns")
+def _task_grouping(conn: Connection):
+    _add_column(conn, "task", "group_id", "TEXT")
+    _add_column(conn, "task", "group_title", "TEXT")
+    if _add_column(conn, "task", "step_order", "INTEGER"):
+        conn.exec_driver_sql("UPDATE task SET step_order = 1 WHERE step_order IS NULL")
+
+
+@migration(2, "task reward message")
+def _task_reward_message(conn: Connection):
+    _add_column(conn, "task", "reward_message", "TEXT")
+
+
+@migration(3, "task access path indexes")
+def _task_indexes(conn: Connection):
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_task_user_created ON task (user_id, created_at)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_task_user_target ON task (user_id, target_date)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_task_status ON task (status)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_task_milestone_id ON task (milestone_id)")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_task_routine_id ON task (routine_id)")
+    # Give the query planner statistics for the new indexes
+    conn.exec_driver_sql("ANALYZE task")
+
+
+@migration(4, "daily_stats rollup backfill")
+def _daily_stats_backfill(conn: Connection):
+    # Table itself comes from create_all(); seed it from existing history
+    print(f"Backfilled {backfill(conn)} daily_stats rows")
+
+
+@migration(5, "user data_version for ETags")
+def _user_data_version(conn: Connection):
+    _add_column(conn, "user", "data_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(6, "idempotency request hash")
+def _idempotency_request_hash(conn: Connection):
+    _add_column(conn, "idempotencyrecord", "request_hash", "TEXT")
+
+
+# --- Runner ---
+
+def _ensure_version_table(conn: Connection):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    )
+
+
+def current_version(engine) -> int:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return conn.exec_driver_sql("SELECT COALESCE(MAX(version), 0) FROM schema_version").scalar()
+
+
+def run_migrations(engine) -> List[int]:
+    """
+    Apply every migration newer than the recorded schema version, each in
+    its own transaction together with its schema_version row. A failing
+    migration is rolled back and re-raised: starting on a half-migrated
+    schema would be worse than not starting.
+    """
+    applied = []
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        done = {row[0] for row in conn.exec_driver_sql("SELECT version FROM schema_version").fetchall()}
+
+    for version, name, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                fn(conn)
+                conn.exec_driver_sql(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, datetime.utcnow().isoformat())
+                )
+        except Exception as e:
+            print(f"Migration {version} ({name}) failed: {e}")
+            raise
+        print(f"Applied migration {version}: {name}")
+        applied.append(version)
+    return applied
@@ -1,5 +1,6 @@
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime, date
 import uuid
 
@@ -18,7 +19,11 @@ class User(SQLModel, table=True):
     failure_streak: int = Field(default=0) # Tracks consecutive failures
     lockout_until: Optional[datetime] = None # Stores timestamp when ban ends
 
-class Task(SQLModel, table=True):
+    # Bumped on every write to this user's tasks/profile; read endpoints derive ETags from it
+    data_version: int = Field(default=0)
+
+class TaskBase(SQLModel):
+    # Columns shared by the hot `task` table and the cold `task_archive` table
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     user_id: str = Field(foreign_key="user.id")
     milestone_id: Optional[str] = Field(default=None, foreign_key="milestone.id")
@@ -36,6 +41,7 @@ class Task(SQLModel, table=True):
     proof_instruction: Optional[str] = None # e.g. "Upload screenshot of terminal"
     minimum_viable_done: str
     last_failure_reason: Optional[str] = None # Stores why it was rejected
+    reward_message: Optional[str] = None # Motivator flavour text, attached after verification
 
     target_date: date = Field(default_factory=date.today) # YYYY-MM-DD
     routine_id: Optional[str] = None # UUID to group recurring tasks (e.g. "Gym" everyday shares this ID)
@@ -45,6 +51,25 @@ class Task(SQLModel, table=True):
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class Task(TaskBase, table=True):
+    # Mirrors the access paths of /dashboard, /calendar, /analytics (see db/migrations.py)
+    __table_args__ = (
+        Index("ix_task_user_created", "user_id", "created_at"),
+        Index("ix_task_user_target", "user_id", "target_date"),
+        Index("ix_task_status", "status"),
+        Index("ix_task_milestone_id", "milestone_id"),
+        Index("ix_task_routine_id", "routine_id"),
+    )
+
+class TaskArchive(TaskBase, table=True):
+    # Completed tasks past the archive horizon (db/archive.py). Only history views read it.
+    __tablename__ = "task_archive"
+    __table_args__ = (
+        Index("ix_task_archive_user_created", "user_id", "created_at"),
+    )
+
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+
 class Campaign(SQLModel, table=True):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), primary_key=True)
     user_id: str = Field(foreign_key="user.id")
@@ -64,4 +89,40 @@ class Milestone(SQLModel, table=True):
 
 class AppSettings(SQLModel, table=True):
     key: str = Field(primary_key=True)
-    value: str
\ No newline at end of file
+    value: str
+class LLMCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True) # sha256 of role + model + messages
+    role: str
+    model_name: str
+    response: str # JSON-encoded parsed agent output
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_accessed: datetime = Field(default_factory=datetime.utcnow, index=True)
+    hits: int = Field(default=0)
+
+class CurriculumCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True) # normalized topic + max_items
+    topic: str
+    payload: str # JSON result of CurriculumBuilder.generate_roadmap_data
+    is_negative: bool = Field(default=False) # "No playlists found" results
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class IdempotencyRecord(SQLModel, table=True):
+    key: str = Field(primary_key=True) # endpoint + client Idempotency-Key
+    endpoint: str
+    request_hash: Optional[str] = None # idempotency.request_hash() of the body the key was first used with
+    response: str # JSON-encoded response body returned the first time
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class DailyStats(SQLModel, table=True):
+    # Per-user, per-day rollup of task outcomes, keyed by the task's creation day
+    # (same bucketing /analytics always used). Maintained by db/rollups.py.
+    __tablename__ = "daily_stats"
+
+    user_id: str = Field(foreign_key="user.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    created: int = Field(default=0)
+    completed: int = Field(default=0)
+    failed: int = Field(default=0) # "retry" (and legacy "failed") verdicts
+    partial: int = Field(default=0)
+    minutes: int = Field(default=0) # estimated_time of completed tasks
+    xp: int = Field(default=0) # XP awarded at verification (not recoverable by backfill)
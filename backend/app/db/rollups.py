@@ -0,0 +1,137 @@
+import argparse
+from datetime import date
+from typing import Dict, List
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+
+from .models import DailyStats, Task
+
+# Incremental maintenance of the daily_stats rollup. Callers run these in the
+# same session/transaction as the task insert or status change, so the rollup
+# commits (or rolls back) together with the task row.
+
+STATUS_COLUMNS = {"completed": "completed", "retry": "failed", "failed": "failed", "partial": "partial"}
+
+
+COUNTER_COLUMNS = ("created", "completed", "failed", "partial", "minutes", "xp")
+
+
+def _bump_many(session: Session, rows: List[dict]) -> None:
+    # One executemany upsert: rows are {"user_id", "day", <counter deltas>}
+    rows = [row for row in rows if any(row.get(c) for c in COUNTER_COLUMNS)]
+    if not rows:
+        return
+    params = [
+        {"user_id": row["user_id"], "day": row["day"], **{c: row.get(c, 0) for c in COUNTER_COLUMNS}}
+        for row in rows
+    ]
+    table = DailyStats.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={c: table.c[c] + stmt.excluded[c] for c in COUNTER_COLUMNS}
+    )
+    session.execute(stmt, params)
+
+
+def _bump(session: Session, user_id: str, day: date, **deltas: int) -> None:
+    _bump_many(session, [{"user_id": user_id, "day": day, **deltas}])
+
+
+def _status_deltas(task: Task, status: str, sign: int) -> Dict[str, int]:
+    column = STATUS_COLUMNS.get(status)
+    if not column:
+        return {}
+    deltas = {column: sign}
+    if status == "completed":
+        deltas["minutes"] = sign * (task.estimated_time or 0)
+    return deltas
+
+
+def record_task_created(session: Session, task: Task) -> None:
+    record_tasks_created(session, [task])
+
+
+def record_tasks_created(session: Session, tasks: List[Task]) -> None:
+    """Rollup for a batch of new tasks, one upsert per (user, day) in a single statement."""
+    buckets: Dict[tuple, Dict[str, int]] = {}
+    for task in tasks:
+        deltas = buckets.setdefault((task.user_id, task.created_at.date()), {})
+        deltas["created"] = deltas.get("created", 0) + 1
+        for k, v in _status_deltas(task, task.status, 1).items():
+            deltas[k] = deltas.get(k, 0) + v
+    _bump_many(session, [{"user_id": u, "day": d, **deltas} for (u, d), deltas in buckets.items()])
+
+
+def record_status_change(session: Session, task: Task, old_status: str, xp: int = 0) -> None:
+    """Move a task's contribution from old_status to task.status (plus any XP it earned)."""
+    if old_status == task.status and not xp:
+        return
+    deltas: Dict[str, int] = {"xp": xp}
+    if old_status != task.status:
+        for status, sign in ((old_status, -1), (task.status, 1)):
+            for k, v in _status_deltas(task, status, sign).items():
+                deltas[k] = deltas.get(k, 0) + v
+    _bump(session, task.user_id, task.created_at.date(), **deltas)
+
+
+def read_daily_stats(session: Session, user_id: str, start: date, end: date) -> List[DailyStats]:
+    return session.exec(
+        select(DailyStats)
+        .where(DailyStats.user_id == user_id)
+        .where(DailyStats.day >= start)
+        .where(DailyStats.day <= end)
+        .order_by(DailyStats.day)
+    ).all()
+
+
+def backfill(conn: Connection) -> int:
+    """
+    Recompute daily_stats counts from the task and task_archive tables. XP
+    isn't stored per task, so tracked XP is kept and days with no tracked XP
+    stay at 0.
+    """
+    conn.exec_driver_sql("UPDATE daily_stats SET created = 0, completed = 0, failed = 0, partial = 0, minutes = 0")
+    conn.exec_driver_sql("""
+        INSERT INTO daily_stats (user_id, day, created, completed, failed, partial, minutes, xp)
+        SELECT
+            user_id,
+            date(created_at),
+            COUNT(*),
+            SUM(status = 'completed'),
+            SUM(status IN ('retry', 'failed')),
+            SUM(status = 'partial'),
+            COALESCE(SUM(CASE WHEN status = 'completed' THEN estimated_time ELSE 0 END), 0),
+            0
+        FROM (
+            SELECT user_id, created_at, status, estimated_time FROM task
+            UNION ALL
+            SELECT user_id, created_at, status, estimated_time FROM task_archive
+        )
+        WHERE true -- SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+        GROUP BY user_id, date(created_at)
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            created = excluded.created,
+            completed = excluded.completed,
+            failed = excluded.failed,
+            partial = excluded.partial,
+            minutes = excluded.minutes
+    """)
+    return conn.exec_driver_sql("SELECT COUNT(*) FROM daily_stats").scalar()
+
+
+if __name__ == "__main__":
+    # python -m app.db.rollups --backfill
+    parser = argparse.ArgumentParser(description="Maintain the daily_stats analytics rollup")
+    parser.add_argument("--backfill", action="store_true", help="rebuild daily_stats from task + task_archive")
+    args = parser.parse_args()
+
+    from .database import engine, init_db
+    init_db()
+    if args.backfill:
+        with engine.begin() as conn:
+            print(f"Backfilled {backfill(conn)} daily_stats rows")
+    else:
+        parser.print_help()
@@ -0,0 +1,20 @@
+from sqlmodel import Session, select, update
+
+from .models import User
+
+# Per-user data version. Every write that changes what a read endpoint would
+# return bumps it in the same transaction; GET endpoints turn it into an ETag
+# (responses.make_etag) so unchanged polls get a bodyless 304.
+
+
+def bump_statement(user_id: str):
+    # Atomic in SQL, so concurrent writers never lose an increment
+    return update(User).where(User.id == user_id).values(data_version=User.data_version + 1)
+
+
+def bump_data_version(session: Session, user_id: str) -> None:
+    session.execute(bump_statement(user_id))
+
+
+def version_statement(user_id: str):
+    return select(User.data_version).where(User.id == user_id)
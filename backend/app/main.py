@@ -1,23 +1,41 @@
-import os, uuid
-from fastapi import FastAPI, Depends, HTTPException
+import os, uuid, json, base64
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request, UploadFile, File, Form, Header
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware  # <-- IMPORT THIS
-from sqlmodel import Session, select
+from sqlmodel import Session, select, or_, and_
+from sqlalchemy import union_all
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime, date, time, timedelta # <--- Add this
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage
 
 # Internal imports
-from .db.database import get_session, init_db
-from .db.models import Task, User, AppSettings, Campaign, Milestone
+from .config import PROOF_UPLOAD_MAX_BYTES, UPLOAD_CHUNK_SIZE
+from .db.database import async_engine, get_async_session, init_db
+from .db.idempotency import arun_idempotent, request_hash
+from .db.context_cache import context_cache
+from .db.rollups import record_task_created, record_tasks_created, record_status_change, read_daily_stats
+from .db.bulk import bulk_insert
+from .db.archive import TASK_COLUMNS, start_archiver, task_history
+from .db.versioning import bump_data_version, bump_statement, version_statement
+from .db.models import Task, TaskArchive, User, AppSettings, Campaign, Milestone
 from .agents.planner import PlannerAgent
 from .agents.verifier import VerifierAgent
 from .agents.motivator import MotivatorAgent
 from .agents.reflector import ReflectorAgent
 from .agents.strategist import StrategistAgent
+from .agents.rewards import calculate_rewards
+from .agents.reflector_context import build_weekly_context
+from .agents.llm_registry import DEFAULT_MODEL, reset_clients
+from .agents.response_cache import response_cache
+from .agents.rate_limit import PRIORITY_INTERACTIVE, estimate_tokens, get_rate_limiter, limiter_snapshot
+from .upload_limit import UploadLimitMiddleware
+from .responses import CompressionMiddleware, FastJSONResponse, make_etag, not_modified, with_etag
 
-app = FastAPI()
+# orjson for every endpoint; hot read endpoints return FastJSONResponse directly (see responses.py)
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # --- NEW: Enable CORS ---
 # This allows the React Frontend (port 5173) to talk to this API
@@ -27,9 +45,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows GET, POST, OPTIONS, etc.
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"], # Readable by the frontend for polling/pagination
 )
 # ------------------------
 
+# Compress larger bodies (calendar, history); leave the NDJSON stream alone
+app.add_middleware(CompressionMiddleware, skip_paths={"/plan/stream"})
+# Whole-body cap for multipart proofs, enforced before the form is parsed (some slack for the text fields)
+app.add_middleware(UploadLimitMiddleware, max_bytes=PROOF_UPLOAD_MAX_BYTES + UPLOAD_CHUNK_SIZE, paths={"/verify/upload"})
+
 # --- Input Models ---
 class PlanRequest(BaseModel):
     goal: str
@@ -59,39 +83,74 @@ class CampaignConfirmRequest(BaseModel):
 @app.on_event("startup")
 def on_startup():
     init_db()
+    start_archiver() # Moves old completed tasks to task_archive, now and periodically
+
+# --- READ HELPERS (projection, pagination, conditional GET) ---
+def _task_columns(fields: Optional[str]) -> List[str]:
+    # ?fields=title,scheduled_time,status -> only those columns are SELECTed; id is always included
+    if not fields:
+        return TASK_COLUMNS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in TASK_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown task fields: {', '.join(unknown)}")
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+def _encode_cursor(target_date: date, task_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{target_date.isoformat()}|{task_id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        day, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return date.fromisoformat(day), task_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _etag_for(request: Request, session: AsyncSession, user_id: str) -> str:
+    # data_version changes on every write; the date covers "today" rolling over, the URL covers params
+    version = (await session.exec(version_statement(user_id))).first()
+    return make_etag(user_id, version, date.today(), request.url.path, request.url.query)
 
 # --- Endpoints ---
 
 @app.get("/dashboard")
-def get_dashboard(session: Session = Depends(get_session)):
+async def get_dashboard(
+    request: Request,
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
     # 1. Get User (Create if not exists)
-    user = session.exec(select(User)).first()
+    user = await context_cache.aget_user(session)
     if not user:
         user = User(name="AlphaUser", xp=0, streak=0)
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
+        context_cache.invalidate_user()
+
+    etag = await _etag_for(request, session, user.id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
 
     # 2. Get Tasks for TODAY only
     # We define "today" as starting from midnight server time
     today_start = datetime.combine(date.today(), time.min)
+    columns = _task_columns(fields)
     
-    tasks = session.exec(
-        select(Task)
+    rows = (await session.exec(
+        select(*[getattr(Task, c) for c in columns])
         .where(Task.user_id == user.id)
         .where(Task.created_at >= today_start)
-    ).all()
+    )).all()
 
-    return {
+    return with_etag(FastJSONResponse({
         "user": user,
-        "tasks": [t.model_dump() for t in tasks]
-    }
+        "tasks": [dict(row._mapping) for row in rows]
+    }), etag)
 
-# --- UPDATED ENDPOINT: PLAN DAY ---
-@app.post("/plan")
-def generate_plan(request: PlanRequest, session: Session = Depends(get_session)):
-    # 1. Get User Context
-    user = session.exec(select(User)).first()
+# --- PLAN HELPERS (shared by /plan and /plan/stream) ---
+def _get_plan_context(session: Session):
+    user = context_cache.get_user(session)
     user_profile = {}
     if user:
         user_profile = {
@@ -118,87 +177,243 @@ def generate_plan(request: PlanRequest, session: Session = Depends(get_session))
         blocked_slots = "None. Calendar is clear."
     # ----------------------------------
 
+    return user, user_profile, blocked_slots
+
+def _build_task(task_data: dict, user_id: str, routine_id: Optional[str], group_ids_by_title: dict) -> Task:
+    # Parse Date
+    t_date_str = task_data.get("target_date", date.today().isoformat())
+    try:
+        t_date = datetime.strptime(t_date_str, "%Y-%m-%d").date()
+    except:
+        t_date = date.today()
+
+    group_title = task_data.get("group_title")
+    group_id = task_data.get("group_id")
+    if group_title and not group_id:
+        if group_title not in group_ids_by_title:
+            group_ids_by_title[group_title] = str(uuid.uuid4())
+        group_id = group_ids_by_title[group_title]
+
+    step_order_raw = task_data.get("step_order", 1)
+    try:
+        step_order = int(step_order_raw)
+    except:
+        step_order = 1
+
+    return Task(
+        user_id=user_id,
+        title=task_data.get("title", "Untitled"),
+        estimated_time=task_data.get("estimated_time", 10),
+        scheduled_time=task_data.get("scheduled_time", "Pending"),
+        is_urgent=task_data.get("is_urgent", False),
+        priority=task_data.get("priority", "medium"),
+        success_criteria=task_data.get("success_criteria", "Complete"),
+        minimum_viable_done=task_data.get("minimum_viable_done", "Do it"),
+        proof_instruction=task_data.get("proof_instruction", "Proof"),
+        
+        # --- NEW FIELDS ---
+        target_date=t_date,
+        routine_id=routine_id,
+        group_id=group_id,
+        group_title=group_title,
+        step_order=step_order,
+        # ------------------
+        
+        status="pending"
+    )
+
+# --- UPDATED ENDPOINT: PLAN DAY ---
+@app.post("/plan")
+async def generate_plan(
+    request: PlanRequest,
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: Optional[str] = Header(None)
+):
+    return await arun_idempotent(
+        idempotency_key, "/plan", lambda: _generate_plan(request, session), request_hash(request.model_dump())
+    )
+
+async def _generate_plan(request: PlanRequest, session: AsyncSession):
+    # 1. Get User Context + existing schedule
+    user, user_profile, blocked_slots = await session.run_sync(_get_plan_context)
+
     # 2. Instantiate Agent
-    planner = PlannerAgent()
+    planner = await PlannerAgent.create()
     
     # 3. Pass profile AND blocked_slots to Agent
-    result = planner.create_plan(
+    result = await planner.acreate_plan(
         user_goal=request.goal, 
         available_time=request.available_time,
         user_profile=user_profile,
         existing_schedule=blocked_slots # <--- PASS THIS NEW ARG
     )
     
-    saved_tasks = []
     if "tasks" in result and len(result["tasks"]) > 0:
         # Check if this is a recurring batch (heuristic: same title, multiple dates)
         is_recurring = len(result["tasks"]) > 1
         routine_id = str(uuid.uuid4()) if is_recurring else None
 
         group_ids_by_title = {}
+        new_tasks = [
+            _build_task(task_data, user.id, routine_id, group_ids_by_title)
+            for task_data in result["tasks"]
+        ]
 
-        for task_data in result["tasks"]:
-            # Parse Date
-            t_date_str = task_data.get("target_date", date.today().isoformat())
-            try:
-                t_date = datetime.strptime(t_date_str, "%Y-%m-%d").date()
-            except:
-                t_date = date.today()
-
-            group_title = task_data.get("group_title")
-            group_id = task_data.get("group_id")
-            if group_title and not group_id:
-                if group_title not in group_ids_by_title:
-                    group_ids_by_title[group_title] = str(uuid.uuid4())
-                group_id = group_ids_by_title[group_title]
-
-            step_order_raw = task_data.get("step_order", 1)
-            try:
-                step_order = int(step_order_raw)
-            except:
-                step_order = 1
-
-            task = Task(
-                user_id=user.id,
-                title=task_data.get("title", "Untitled"),
-                estimated_time=task_data.get("estimated_time", 10),
-                scheduled_time=task_data.get("scheduled_time", "Pending"),
-                is_urgent=task_data.get("is_urgent", False),
-                priority=task_data.get("priority", "medium"),
-                success_criteria=task_data.get("success_criteria", "Complete"),
-                minimum_viable_done=task_data.get("minimum_viable_done", "Do it"),
-                proof_instruction=task_data.get("proof_instruction", "Proof"),
-                
-                # --- NEW FIELDS ---
-                target_date=t_date,
-                routine_id=routine_id,
-                group_id=group_id,
-                group_title=group_title,
-                step_order=step_order,
-                # ------------------
-                
-                status="pending"
-            )
-            session.add(task)
-            saved_tasks.append(task)
-        
-        session.commit()
-        for t in saved_tasks: session.refresh(t)
+        # One executemany + one rollup upsert, single commit (ids are generated client-side)
+        saved_tasks = await session.run_sync(bulk_insert, new_tasks)
+        await session.run_sync(record_tasks_created, new_tasks)
+        await session.execute(bump_statement(user.id))
+        await session.commit()
 
         return {
             "status": "success", 
-            "tasks": [t.model_dump() for t in saved_tasks] 
+            "tasks": saved_tasks
         }
     
     return {"status": "error", "message": "No tasks generated", "debug": result}
 
+# --- STREAMING PLAN (NDJSON) ---
+# One JSON object per line:
+#   {"type": "task", "task": {...}}   as soon as each task is generated + saved
+#   {"type": "done", "count": N}      when the plan is complete
+#   {"type": "error", "message": ...} if generation failed
+@app.post("/plan/stream")
+async def stream_plan(request: PlanRequest, session: AsyncSession = Depends(get_async_session)):
+    user, user_profile, blocked_slots = await session.run_sync(_get_plan_context)
+    user_id = user.id
+
+    planner = await PlannerAgent.create()
+    if not planner.llm:
+        return {"status": "error", "message": "API Key Missing. Please go to Settings."}
+
+    async def event_stream():
+        # The request-scoped session may be closed once streaming starts, use our own
+        routine_id = str(uuid.uuid4())
+        group_ids_by_title = {}
+        saved_ids = []
+
+        async with AsyncSession(async_engine, expire_on_commit=False) as stream_session:
+            async def save(task: Task) -> str:
+                payload = task.model_dump()
+                stream_session.add(task)
+                await stream_session.run_sync(record_task_created, task)
+                await stream_session.execute(bump_statement(user_id))
+                await stream_session.commit()
+                saved_ids.append(payload["id"])
+                return json.dumps({"type": "task", "task": payload}, default=str) + "\n"
+
+            # Same heuristic as /plan: a single task is not a routine. The first
+            # task is held back until a second one shows up (or the stream ends),
+            # so it is emitted with the routine_id it is stored with.
+            held = None
+            error = None
+            try:
+                async for task_data in planner.astream_plan(
+                    user_goal=request.goal,
+                    available_time=request.available_time,
+                    user_profile=user_profile,
+                    existing_schedule=blocked_slots
+                ):
+                    task = _build_task(task_data, user_id, routine_id, group_ids_by_title)
+                    if not saved_ids and held is None:
+                        held = task
+                        continue
+                    if held is not None:
+                        yield await save(held)
+                        held = None
+                    yield await save(task)
+            except Exception as e:
+                error = str(e)
+
+            if held is not None:
+                held.routine_id = None
+                yield await save(held)
+            if error:
+                yield json.dumps({"type": "error", "message": error}) + "\n"
+                return
+
+        if not saved_ids:
+            yield json.dumps({"type": "error", "message": "No tasks generated"}) + "\n"
+            return
+        yield json.dumps({"type": "done", "count": len(saved_ids)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+async def _attach_reward_message(task_id: str, task_title: str, estimated_time: int, quality_score: int, current_streak: int):
+    # Runs after /verify has responded; the frontend picks the message up on its next fetch
+    motivator = await MotivatorAgent.create()
+    reward = await motivator.adistribute_rewards(task_title, estimated_time, quality_score, current_streak)
+    message = reward.get("message")
+    if not message:
+        return
+
+    async with AsyncSession(async_engine) as session:
+        task = await session.get(Task, task_id)
+        if task:
+            task.reward_message = message
+            session.add(task)
+            await session.execute(bump_statement(task.user_id))
+            await session.commit()
+
 @app.post("/verify")
-def verify_proof(request: ProofRequest, session: Session = Depends(get_session)):
+async def verify_proof(
+    request: ProofRequest,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: Optional[str] = Header(None)
+):
+    return await arun_idempotent(idempotency_key, "/verify", lambda: _process_verification(
+        request.task_id, request.proof_content, request.proof_image, background_tasks, session
+    ), request_hash(request.model_dump()))
+
+async def _read_upload_capped(upload: UploadFile, max_bytes: int) -> bytes:
+    # UploadLimitMiddleware already capped the whole body; this keeps the image part itself under the limit
+    data = bytearray()
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        data.extend(chunk)
+        if len(data) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Proof image exceeds {max_bytes // (1024 * 1024)} MB limit")
+    return bytes(data)
+
+# --- MULTIPART VERIFY ---
+# Same as /verify, but the image is sent as a raw file part instead of base64-in-JSON.
+# Starlette spools the part to a temp file; we pass bytes straight to the verifier.
+@app.post("/verify/upload")
+async def verify_proof_upload(
+    background_tasks: BackgroundTasks,
+    task_id: str = Form(...),
+    proof_content: str = Form(""),
+    proof_image: Optional[UploadFile] = File(None),
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: Optional[str] = Header(None)
+):
+    image_bytes = None
+    if proof_image is not None:
+        try:
+            image_bytes = await _read_upload_capped(proof_image, PROOF_UPLOAD_MAX_BYTES)
+        finally:
+            await proof_image.close()
+
+    fingerprint = request_hash({"task_id": task_id, "proof_content": proof_content, "proof_image": image_bytes})
+    return await arun_idempotent(idempotency_key, "/verify", lambda: _process_verification(
+        task_id, proof_content, image_bytes or None, background_tasks, session
+    ), fingerprint)
+
+async def _process_verification(
+    task_id: str,
+    proof_content: str,
+    proof_image: Optional[Union[str, bytes]],
+    background_tasks: BackgroundTasks,
+    session: AsyncSession
+):
     # ... (Fetch task logic) ...
-    task = session.get(Task, request.task_id)
+    task = await session.get(Task, task_id)
     if not task: raise HTTPException(status_code=404, detail="Task not found")
     
-    user = session.exec(select(User)).first()
+    user = await context_cache.aget_user_for_update(session)
 
     # --- 1. CHECK LOCKOUT STATUS ---
     if user.lockout_until and datetime.utcnow() < user.lockout_until:
@@ -213,16 +428,28 @@ def verify_proof(request: ProofRequest, session: Session = Depends(get_session))
     # -------------------------------
 
     # Call Verifier (Existing Code)
-    verifier = VerifierAgent()
-    verification_result = verifier.verify_task(
+    verifier = await VerifierAgent.create()
+    verification_result = await verifier.averify_task(
         task_title=task.title,
         success_criteria=task.success_criteria,
-        user_proof=request.proof_content,
-        image_data=request.proof_image
+        user_proof=proof_content,
+        image_data=proof_image,
+        task_id=task.id
     )
 
+    # Provider/parse failures are not a verdict: no status change, no strike toward lockout
+    if "error" in verification_result:
+        return {
+            "status": "unavailable",
+            "task_status": task.status,
+            "verification": {"verdict": "error", "reason": f"Verification unavailable: {verification_result['error']}"},
+            "reward": {},
+            "task": task.model_dump()
+        }
+
     verdict = verification_result.get("verdict", "retry").lower()
     reason = verification_result.get("reason", "Criteria not met.")
+    previous_status = task.status
     
     if verdict == "pass":
         # ... (Success logic) ...
@@ -233,10 +460,15 @@ def verify_proof(request: ProofRequest, session: Session = Depends(get_session))
         user.failure_streak = 0
         user.lockout_until = None
         
-        # Apply rewards
-        motivator = MotivatorAgent()
-        reward_data = motivator.distribute_rewards(task.title, task.estimated_time, 100, user.streak)
-        user.xp += reward_data.get("xp_gained", 10)
+        # Apply rewards (deterministic, no LLM round trip on the critical path)
+        quality_score = verification_result.get("quality_score", 100)
+        reward_data = calculate_rewards(task.estimated_time, quality_score, user.streak)
+        user.xp += reward_data["xp_gained"]
+
+        # The motivator's flavour message is attached to the task afterwards
+        background_tasks.add_task(
+            _attach_reward_message, task.id, task.title, task.estimated_time, quality_score, user.streak
+        )
         user.streak += 1
         
     elif verdict == "partial":
@@ -260,7 +492,12 @@ def verify_proof(request: ProofRequest, session: Session = Depends(get_session))
 
     session.add(user)
     session.add(task)
-    session.commit()
+    # Keep the analytics rollup in the same transaction as the status change
+    xp_gained = reward_data["xp_gained"] if verdict == "pass" else 0
+    await session.run_sync(lambda s: record_status_change(s, task, previous_status, xp=xp_gained))
+    await session.execute(bump_statement(user.id))
+    await session.commit()
+    context_cache.invalidate_user() # xp / streak / lockout changed
     # ... (Rest of return logic) ...
     
     # Return specific status if locked just now
@@ -277,54 +514,121 @@ def verify_proof(request: ProofRequest, session: Session = Depends(get_session))
     }
 
 @app.get("/calendar")
-def get_calendar_tasks(session: Session = Depends(get_session)):
-    user = session.exec(select(User)).first()
+async def get_calendar_tasks(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session)
+):
+    user = await context_cache.aget_user(session)
     if not user: return []
 
-    today = date.today()
-    end_date = today + timedelta(days=30)
-    
-    tasks = session.exec(
-        select(Task)
-        .where(Task.user_id == user.id)
-        .where(Task.target_date >= today)
-        .where(Task.target_date <= end_date)
-    ).all()
-    
-    return [t.model_dump() for t in tasks]
+    etag = await _etag_for(request, session, user.id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    # Default window: today + 30 days
+    start = start or date.today()
+    end = end or start + timedelta(days=30)
+    columns = _task_columns(fields)
+    # Keyset pagination orders by (target_date, id), so both are selected even if not requested
+    selected = columns + [c for c in ("target_date",) if c not in columns]
+
+    after = _decode_cursor(cursor) if cursor else None
+
+    def scoped(model):
+        query = (
+            select(*[getattr(model, c) for c in selected])
+            .where(model.user_id == user.id)
+            .where(model.target_date >= start)
+            .where(model.target_date <= end)
+        )
+        if after:
+            query = query.where(or_(
+                model.target_date > after[0],
+                and_(model.target_date == after[0], model.id > after[1])
+            ))
+        return query
+
+    # Archived tasks are always due before today, so only windows reaching into the past need task_archive
+    if start < date.today():
+        window = union_all(scoped(Task), scoped(TaskArchive)).subquery()
+        query = select(*window.c).order_by(window.c.target_date, window.c.id)
+    else:
+        query = scoped(Task).order_by(Task.target_date, Task.id)
+    if limit:
+        limit = max(1, min(limit, 500))
+        query = query.limit(limit + 1) # One extra row tells us whether there is a next page
+
+    rows = [dict(row._mapping) for row in (await session.exec(query)).all()]
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["target_date"], rows[-1]["id"])
+    if len(selected) > len(columns):
+        for row in rows:
+            row.pop("target_date")
+
+    response = with_etag(FastJSONResponse(rows), etag)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+# --- HISTORY (hot + archived tasks) ---
+@app.get("/tasks/history")
+async def get_task_history(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    fields: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    session: AsyncSession = Depends(get_async_session)
+):
+    user = await context_cache.aget_user(session)
+    if not user: return []
+
+    etag = await _etag_for(request, session, user.id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+
+    columns = _task_columns(fields)
+    limit = max(1, min(limit, 500))
+    history = await session.run_sync(
+        lambda s: task_history(s, user.id, start=start, end=end, limit=limit, offset=max(0, offset), columns=columns)
+    )
+    return with_etag(FastJSONResponse(history), etag)
 
 @app.get("/analytics")
-def get_analytics(session: Session = Depends(get_session)):
-    user = session.exec(select(User)).first()
+async def get_analytics(request: Request, days: int = 28, session: AsyncSession = Depends(get_async_session)):
+    user = await context_cache.aget_user(session)
     if not user:
         return {}
-    
-    # ... inside get_analytics ...
 
-    # 1. Calculate Date Range (Last 28 Days for Heatmap)
-    today = date.today()
-    heatmap_start = today - timedelta(days=27) # 28 days total
-    
-    # 2. Fetch tasks
-    tasks = session.exec(
-        select(Task)
-        .where(Task.user_id == user.id)
-        .where(Task.created_at >= datetime.combine(heatmap_start, time.min))
-    ).all()
+    etag = await _etag_for(request, session, user.id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
 
-    # 3. Process Heatmap Data (Map Date -> Count)
-    activity_map = {}
-    for t in tasks:
-        if t.status == 'completed':
-            d_str = t.created_at.strftime("%Y-%m-%d")
-            activity_map[d_str] = activity_map.get(d_str, 0) + 1
+    # All numbers come from the daily_stats rollup (db/rollups.py): one indexed
+    # range read, however many days the heatmap covers.
+    days = max(7, min(days, 366))
+    today = date.today()
+    heatmap_start = today - timedelta(days=days - 1)
+    rows = {row.day: row for row in await session.run_sync(read_daily_stats, user.id, heatmap_start, today)}
 
-    # 4. Generate Full List (Fill zeros for missing days)
+    # 1. Heatmap (Map Date -> Completed Count, zeros filled in)
     heatmap_data = []
-    for i in range(28):
+    for i in range(days):
         current_date = heatmap_start + timedelta(days=i)
-        d_str = current_date.strftime("%Y-%m-%d")
-        count = activity_map.get(d_str, 0)
+        row = rows.get(current_date)
+        count = row.completed if row else 0
         
         # Determine intensity level (0-4) for coloring
         intensity = 0
@@ -334,101 +638,57 @@ def get_analytics(session: Session = Depends(get_session)):
         if count > 6: intensity = 4
 
         heatmap_data.append({
-            "date": d_str,
+            "date": current_date.strftime("%Y-%m-%d"),
             "day_name": current_date.strftime("%a")[0], # M, T, W...
             "count": count,
             "intensity": intensity
         })
 
-    # [Rest of your existing Chart Data Logic for last 7 days goes here...]
-
-    # 1. Calculate Date Range (Last 7 Days)
-    today = date.today()
+    # 2. Chart + stats over the last 7 days
     start_date = today - timedelta(days=6)
-    
-    # 2. Fetch all tasks in this range
-    tasks = session.exec(
-        select(Task)
-        .where(Task.user_id == user.id)
-        .where(Task.created_at >= datetime.combine(start_date, time.min))
-    ).all()
+    week = [rows.get(start_date + timedelta(days=i)) for i in range(7)]
+
+    chart_data = [
+        {"day": (start_date + timedelta(days=i)).strftime("%a"), "minutes": row.minutes if row else 0}
+        for i, row in enumerate(week)
+    ]
+
+    total_completed = sum(row.completed for row in week if row)
+    total_failed = sum(row.failed for row in week if row)
+    total_partial = sum(row.partial for row in week if row)
+    total_verified = total_completed + total_failed + total_partial
 
-    # 3. Aggregate Data for Charts
-    # Format: { "Mon": 50, "Tue": 120, ... }
-    daily_xp = {}
-    
-    # Initialize with 0
-    for i in range(7):
-        day_str = (start_date + timedelta(days=i)).strftime("%a") # Mon, Tue...
-        daily_xp[day_str] = 0
-
-    total_completed = 0
-    total_failed = 0
-
-    for t in tasks:
-        day_str = t.created_at.strftime("%a")
-        if t.status == 'completed':
-            # Simple heuristic: Completed task = 20 XP (approx) 
-            # In a real app, store XP per task in DB. 
-            # For now, we estimate based on count or if you added an xp column to tasks.
-            # Let's assume 1 task = 1 unit of productivity for the chart
-            daily_xp[day_str] += t.estimated_time 
-            total_completed += 1
-        elif t.status == 'retry':
-            total_failed += 1
-
-    chart_data = [{"day": k, "minutes": v} for k, v in daily_xp.items()]
-
-    verifiable_tasks = [t for t in tasks if t.status in ['completed', 'failed', 'retry', 'partial']]
-    total_verified = len(verifiable_tasks)
-    
     trust_score = 100 # Default
     if total_verified > 0:
-        good_outcomes = len([t for t in verifiable_tasks if t.status in ['completed', 'partial']])
-        trust_score = int((good_outcomes / total_verified) * 100)
-    # ----------------------------------
+        trust_score = int(((total_completed + total_partial) / total_verified) * 100)
 
-    return {
-        "chart_data": chart_data, # (Existing)
-        "heatmap_data": heatmap_data, # (Existing)
+    return with_etag(FastJSONResponse({
+        "chart_data": chart_data,
+        "heatmap_data": heatmap_data,
         "stats": {
             "total_completed": total_completed,
             "total_failed": total_failed,
             "completion_rate": int((total_completed / (total_completed + total_failed + 1)) * 100),
-            "trust_score": trust_score # <--- NEW
+            "trust_score": trust_score,
+            "xp_gained": sum(row.xp for row in week if row)
         }
-    }
+    }), etag)
 
 @app.post("/analytics/report")
-def generate_report(session: Session = Depends(get_session)):
-    user = session.exec(select(User)).first()
-    
-    # Fetch last 7 days for the report
-    week_start = datetime.utcnow() - timedelta(days=7)
-    recent_tasks = session.exec(
-        select(Task).where(Task.created_at >= week_start)
-    ).all()
-    
-    # Summarize for LLM (Text compression)
-    history_text = "\n".join([
-        f"- {t.title}: {t.status.upper()} ({t.last_failure_reason or 'No issues'})"
-        for t in recent_tasks
-    ])
+async def generate_report(session: AsyncSession = Depends(get_async_session)):
+    user = await context_cache.aget_user(session)
     
-    # Calculate Score
-    verifiable = [t for t in recent_tasks if t.status in ['completed', 'retry']]
-    score = 100
-    if verifiable:
-        score = int((len([t for t in verifiable if t.status=='completed']) / len(verifiable)) * 100)
+    # Pre-aggregated, token-bounded summary of this user's last 7 days
+    weekly = await session.run_sync(lambda s: build_weekly_context(s, user.id, days=7))
 
     # Call Agent
-    reflector = ReflectorAgent()
-    report = reflector.generate_debrief(user.name, history_text, score)
+    reflector = await ReflectorAgent.create()
+    report = await reflector.agenerate_debrief(user.name, weekly.summary, weekly.trust_score)
     
     return report
 
 @app.post("/settings/key")
-def save_api_key(request: KeyRequest, session: Session = Depends(get_session)):
+async def save_api_key(request: KeyRequest, session: AsyncSession = Depends(get_async_session)):
     # 0. Basic Format Check
     if not request.api_key or not request.api_key.startswith("gsk_"):
         return {"status": "error", "message": "Invalid Key Format (must start with 'gsk_')"}
@@ -438,12 +698,18 @@ def save_api_key(request: KeyRequest, session: Session = Depends(get_session)):
         # Use a cheap/fast model to test the key
         test_llm = ChatGroq(
             api_key=request.api_key, 
-            model_name="openai/gpt-oss-120b",
+            model_name=DEFAULT_MODEL,
             temperature=0,
             max_retries=0 # Fail immediately if key is wrong
         )
-        # Send a tiny packet to see if Groq accepts it
-        test_llm.invoke([HumanMessage(content="ping")])
+        # Send a tiny packet to see if Groq accepts it (through the shared limiter)
+        ping = [HumanMessage(content="ping")]
+        limiter = get_rate_limiter(DEFAULT_MODEL)
+        permit = await limiter.aacquire(PRIORITY_INTERACTIVE, estimate_tokens(ping, max_output=64), max_wait=15)
+        try:
+            await test_llm.ainvoke(ping)
+        finally:
+            limiter.release(permit)
         
     except Exception as e:
         error_msg = str(e)
@@ -459,17 +725,19 @@ def save_api_key(request: KeyRequest, session: Session = Depends(get_session)):
 
     # 2. Save to DB (Only runs if Step 1 passes)
     try:
-        setting = session.get(AppSettings, "groq_api_key")
+        setting = await session.get(AppSettings, "groq_api_key")
         if not setting:
             setting = AppSettings(key="groq_api_key", value=request.api_key)
         else:
             setting.value = request.api_key
         
         session.add(setting)
-        session.commit()
+        await session.commit()
+        context_cache.invalidate_setting("groq_api_key")
         
         # Update Runtime
         os.environ["GROQ_API_KEY"] = request.api_key
+        reset_clients(request.api_key) # Old-key clients get rebuilt on next use
         
     except Exception as e:
         print(f"DB Error: {str(e)}")
@@ -478,23 +746,33 @@ def save_api_key(request: KeyRequest, session: Session = Depends(get_session)):
     return {"status": "success", "message": "Neural Link Established."}
 
 @app.get("/settings/key")
-def get_api_key_status(session: Session = Depends(get_session)):
-    # Check DB ONLY
-    setting = session.get(AppSettings, "groq_api_key")
+def get_api_key_status():
+    # Check DB ONLY (through the settings cache)
+    api_key = context_cache.get_setting("groq_api_key")
     
-    if setting and setting.value:
-        masked = f"{setting.value[:4]}...{setting.value[-4:]}"
+    if api_key:
+        masked = f"{api_key[:4]}...{api_key[-4:]}"
         return {"configured": True, "masked": masked, "source": "Database"}
         
     # If not in DB, it is OFFLINE. Period.
     return {"configured": False, "masked": None, "source": None}
 
+@app.get("/system/cache")
+def get_cache_stats():
+    # Hit/miss counters for the LLM response cache (since process start)
+    return response_cache.snapshot()
+
+@app.get("/system/rate-limits")
+def get_rate_limit_stats():
+    # Live view of the client-side Groq limiter (per model)
+    return limiter_snapshot()
+
 # Add this Input Model
 
 # --- NEW ENDPOINT: SAVE PROFILE ---
 @app.post("/user/onboard")
-def onboard_user(request: OnboardingRequest, session: Session = Depends(get_session)):
-    user = session.exec(select(User)).first()
+async def onboard_user(request: OnboardingRequest, session: AsyncSession = Depends(get_async_session)):
+    user = await context_cache.aget_user_for_update(session)
     if not user:
         user = User()
     
@@ -505,15 +783,17 @@ def onboard_user(request: OnboardingRequest, session: Session = Depends(get_sess
     user.bad_habits = request.bad_habits
     
     session.add(user)
-    session.commit()
+    await session.execute(bump_statement(user.id))
+    await session.commit()
+    context_cache.invalidate_user()
     return {"status": "success", "message": "Identity verified. Context loaded."}
 
 # --- CAMPAIGN ENDPOINTS ---
 
 @app.post("/campaign/strategize")
-def strategize_campaign(request: CampaignRequest, session: Session = Depends(get_session)):
+async def strategize_campaign(request: CampaignRequest, session: AsyncSession = Depends(get_async_session)):
     # 1. Get User Context
-    user = session.exec(select(User)).first()
+    user = await context_cache.aget_user(session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -526,8 +806,8 @@ def strategize_campaign(request: CampaignRequest, session: Session = Depends(get
     }
     
     # 2. Call StrategistAgent
-    strategist = StrategistAgent()
-    campaign_plan = strategist.generate_campaign_plan(
+    strategist = await StrategistAgent.create()
+    campaign_plan = await strategist.agenerate_campaign_plan(
         user_goal=request.goal,
         user_profile=user_profile
     )
@@ -542,9 +822,20 @@ def strategize_campaign(request: CampaignRequest, session: Session = Depends(get
     }
 
 @app.post("/campaign/confirm")
-def confirm_campaign(request: CampaignConfirmRequest, session: Session = Depends(get_session)):
+async def confirm_campaign(
+    request: CampaignConfirmRequest,
+    session: AsyncSession = Depends(get_async_session),
+    idempotency_key: Optional[str] = Header(None)
+):
+    # The scheduling logic is plain sync ORM code; run_sync drives it over aiosqlite
+    return await arun_idempotent(
+        idempotency_key, "/campaign/confirm", lambda: session.run_sync(_confirm_campaign, request),
+        request_hash(request.model_dump())
+    )
+
+def _confirm_campaign(session: Session, request: CampaignConfirmRequest):
     # 1. Get User
-    user = session.exec(select(User)).first()
+    user = context_cache.get_user(session)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -559,11 +850,7 @@ def confirm_campaign(request: CampaignConfirmRequest, session: Session = Depends
         status="active"
     )
     
-    session.add(campaign)
-    session.commit()
-    session.refresh(campaign)
-    
-    # 3. Save Milestones
+    # 3. Build Milestones (everything is written in one transaction below)
     milestones = []
     for idx, milestone_data in enumerate(campaign_plan.get("milestones", [])):
         milestone = Milestone(
@@ -573,12 +860,8 @@ def confirm_campaign(request: CampaignConfirmRequest, session: Session = Depends
             week_number=idx + 1,
             is_active=(idx == 0)  # Only first milestone is active
         )
-        session.add(milestone)
         milestones.append(milestone)
     
-    session.commit()
-    for m in milestones: session.refresh(m)
-    
     # 4. Schedule tasks from FIRST ACTIVE milestone
     first_milestone = milestones[0] if milestones else None
     scheduled_tasks = []
@@ -627,16 +910,18 @@ def confirm_campaign(request: CampaignConfirmRequest, session: Session = Depends
                 proof_instruction="Upload progress proof",
                 status="pending"
             )
-            session.add(task)
             scheduled_tasks.append(task)
     
+    # 5. Save campaign, milestones and tasks in a single transaction
+    saved = bulk_insert(session, [campaign] + milestones + scheduled_tasks)
+    record_tasks_created(session, scheduled_tasks)
+    bump_data_version(session, user.id)
     session.commit()
-    for t in scheduled_tasks: session.refresh(t)
     
     return {
         "status": "success",
-        "campaign": campaign.model_dump(),
-        "milestones": [m.model_dump() for m in milestones],
-        "scheduled_tasks": [t.model_dump() for t in scheduled_tasks],
+        "campaign": saved[0],
+        "milestones": saved[1:1 + len(milestones)],
+        "scheduled_tasks": saved[1 + len(milestones):],
         "message": f"Campaign '{campaign.title}' created with {len(scheduled_tasks)} tasks scheduled"
     }
\ No newline at end of file
@@ -0,0 +1,95 @@
+import hashlib
+from typing import Any, Iterable, Optional
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlmodel import SQLModel
+from starlette.middleware.gzip import GZipMiddleware
+
+from .config import COMPRESSION_MIN_BYTES
+
+try:
+    from brotli_asgi import BrotliMiddleware # Optional: pip install brotli-asgi
+except ImportError:
+    BrotliMiddleware = None
+
+
+def row_to_dict(row: SQLModel) -> dict:
+    # Loaded rows already hold their column values; skip model_dump()'s validation pass
+    data = row.__dict__
+    fields = type(row).model_fields
+    if all(name in data for name in fields):
+        return {name: data[name] for name in fields}
+    return row.model_dump() # Expired/deferred attributes: let the ORM load them
+
+
+def _default(obj: Any):
+    if isinstance(obj, SQLModel):
+        return row_to_dict(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson-backed JSON response. orjson handles datetime/date natively and
+    SQLModel rows go through row_to_dict, so endpoints can return rows as-is.
+    Returning an instance directly also skips FastAPI's jsonable_encoder pass.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# --- Conditional GET ---
+def make_etag(*parts: Any) -> str:
+    # Weak: the same data may be sent with different encodings/compression
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A bodyless 304 if the client already holds this ETag, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = {tag.strip() for tag in header.split(",")}
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache" # Always revalidate, never serve stale
+    return response
+
+
+class CompressionMiddleware:
+    """
+    Brotli (when brotli-asgi is installed, gzip fallback) or gzip for responses
+    above minimum_size. Streaming routes are passed through untouched so each
+    NDJSON line reaches the client as soon as it is produced.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES, skip_paths: Iterable[str] = ()):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=6)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in self.skip_paths:
+            await self.compressed(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
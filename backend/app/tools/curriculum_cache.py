@@ -0,0 +1,99 @@
+import json
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlmodel import Session
+
+from ..config import CURRICULUM_CACHE_STALE_TTL, CURRICULUM_CACHE_TTL, CURRICULUM_NEGATIVE_TTL
+from ..db.database import engine
+from ..db.models import CurriculumCacheEntry
+
+NO_PLAYLISTS_ERROR = "No playlists found for this topic."
+
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+
+def normalize_topic(topic: str) -> str:
+    # "  Python   Basics!" and "python basics" share an entry
+    topic = re.sub(r"[^\w\s+#]", " ", topic.lower())
+    return " ".join(topic.split())
+
+
+def _cache_key(topic: str, max_items: int) -> str:
+    return f"{normalize_topic(topic)}|{max_items}"
+
+
+def _load(key: str) -> Optional[CurriculumCacheEntry]:
+    try:
+        with Session(engine) as session:
+            return session.get(CurriculumCacheEntry, key)
+    except Exception as e:
+        print(f"Curriculum cache read failed: {e}")
+        return None
+
+
+def _store(key: str, topic: str, data: dict) -> None:
+    is_negative = data.get("error") == NO_PLAYLISTS_ERROR
+    # Transient failures (timeouts, parse errors) are never cached
+    if "error" in data and not is_negative:
+        return
+
+    try:
+        with Session(engine) as session:
+            entry = session.get(CurriculumCacheEntry, key)
+            if not entry:
+                entry = CurriculumCacheEntry(key=key, topic=topic, payload="")
+            entry.payload = json.dumps(data)
+            entry.is_negative = is_negative
+            entry.created_at = datetime.utcnow()
+            session.add(entry)
+            session.commit()
+    except Exception as e:
+        print(f"Curriculum cache write failed: {e}")
+
+
+def _refresh_in_background(key: str, topic: str, fetch: Callable[[], dict]) -> None:
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def worker():
+        try:
+            _store(key, topic, fetch())
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=worker, name="curriculum-refresh", daemon=True).start()
+
+
+def get_or_fetch(topic: str, max_items: int, fetch: Callable[[], dict]) -> dict:
+    """
+    Cached wrapper around a curriculum lookup.
+    - fresh hit: returned as is
+    - stale hit (older than the TTL but inside the stale window): returned
+      immediately while a background thread refreshes the entry
+    - "No playlists found" is cached for CURRICULUM_NEGATIVE_TTL
+    """
+    key = _cache_key(topic, max_items)
+    entry = _load(key)
+
+    if entry:
+        age = datetime.utcnow() - entry.created_at
+        data = json.loads(entry.payload)
+        if entry.is_negative:
+            if age < timedelta(seconds=CURRICULUM_NEGATIVE_TTL):
+                return data
+        elif age < timedelta(seconds=CURRICULUM_CACHE_TTL):
+            return data
+        elif age < timedelta(seconds=CURRICULUM_CACHE_STALE_TTL):
+            _refresh_in_background(key, topic, fetch)
+            return data
+
+    data = fetch()
+    _store(key, topic, data)
+    return data
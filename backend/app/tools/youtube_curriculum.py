@@ -1,5 +1,8 @@
+import codecs
 import json
 import re
+import threading
+from typing import Optional
 from urllib.parse import quote_plus
 
 import requests
@@ -7,6 +10,72 @@ import yt_dlp
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 
+from .curriculum_cache import NO_PLAYLISTS_ERROR, get_or_fetch
+
+
+PLAYLIST_ID_RE = re.compile(r'"playlistId":"([A-Za-z0-9_-]{3,})"')
+RENDERER_MARKER = '"playlistRenderer"'
+INITIAL_DATA_MARKER = "var ytInitialData = "
+INITIAL_DATA_END = ";</script>"
+# Longest marker/match that can straddle two chunks
+SCAN_OVERLAP = 128
+
+
+class PlaylistIdScanner:
+    """
+    Single-pass, incremental search for the first playlist id in a YouTube
+    results page. Only a small tail of the previous chunk is kept, so the
+    page is never held in memory as a whole.
+
+    feed() returns the id of the first playlistRenderer as soon as it is
+    seen. Any other "playlistId" is remembered as a fallback and returned
+    by finish(). `exhausted` turns True once ytInitialData has ended, at
+    which point the rest of the page can't contain search results.
+    """
+
+    def __init__(self):
+        self._tail = ""
+        self._in_renderer = False
+        self._in_initial_data = False
+        self.fallback_id = None
+        self.exhausted = False
+
+    def feed(self, text: str):
+        window = self._tail + text
+        pos = 0
+
+        if not self._in_initial_data:
+            start = window.find(INITIAL_DATA_MARKER)
+            if start != -1:
+                self._in_initial_data = True
+                pos = start + len(INITIAL_DATA_MARKER)
+
+        while True:
+            match = PLAYLIST_ID_RE.search(window, pos)
+            renderer_at = window.find(RENDERER_MARKER, pos)
+
+            if renderer_at != -1 and (not match or renderer_at < match.start()):
+                self._in_renderer = True
+                pos = renderer_at + len(RENDERER_MARKER)
+                continue
+            if not match:
+                break
+            if self._in_renderer:
+                return match.group(1)
+            if self.fallback_id is None:
+                self.fallback_id = match.group(1)
+            pos = match.end()
+
+        if self._in_initial_data and window.find(INITIAL_DATA_END, pos) != -1:
+            self.exhausted = True
+
+        # Keep an overlap for markers split across chunks, but never re-scan what we consumed
+        self._tail = window[max(pos, len(window) - SCAN_OVERLAP):]
+        return None
+
+    def finish(self):
+        return self.fallback_id
+
 
 class CurriculumBuilder:
     def __init__(self):
@@ -16,6 +85,15 @@ class CurriculumBuilder:
             "Accept-Language": "en-US,en;q=0.9",
         })
 
+        # One long-lived extractor. YoutubeDL is not thread-safe, so calls are serialized.
+        self.ydl = yt_dlp.YoutubeDL({
+            "quiet": True,
+            "extract_flat": True,
+            "ignoreerrors": True,
+            "lazy_playlist": True, # Only page through the playlist as entries are consumed
+        })
+        self._ydl_lock = threading.Lock()
+
     def generate_roadmap_data(self, topic: str, max_items: int = 30):
         print(f"📡 Scanning YouTube for best '{topic}' curriculum...")
 
@@ -23,13 +101,13 @@ class CurriculumBuilder:
         search_url = f"https://www.youtube.com/results?search_query={search_query}&sp=EgIQAw%253D%253D"
 
         try:
-            response = self.session.get(search_url, timeout=10)
+            response = self.session.get(search_url, timeout=10, stream=True)
             response.raise_for_status()
 
-            playlist_id = self._extract_first_playlist_id(response.text)
+            playlist_id = self._stream_first_playlist_id(response)
 
             if not playlist_id:
-                return {"error": "No playlists found for this topic."}
+                return {"error": NO_PLAYLISTS_ERROR}
 
             playlist_url = f"https://www.youtube.com/playlist?list={playlist_id}"
             print(f"🔗 Found Playlist URL: {playlist_url}")
@@ -39,64 +117,69 @@ class CurriculumBuilder:
         except Exception as e:
             return {"error": f"Curriculum search failed: {str(e)}"}
 
-    def _extract_first_playlist_id(self, html: str):
+    @staticmethod
+    def _extract_first_playlist_id(html: str):
+        # Whole-document wrapper around the streaming scanner (benchmarks/playlist_scanner.py)
+        scanner = PlaylistIdScanner()
+        return scanner.feed(html) or scanner.finish()
+
+    @staticmethod
+    def _stream_first_playlist_id(response, chunk_size: int = 16384):
+        """
+        Scan the search page as it downloads and hang up as soon as the first
+        playlistRenderer id (or the end of ytInitialData) has been seen.
+        """
+        scanner = PlaylistIdScanner()
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
         try:
-            pattern = r"var ytInitialData = ({.*?});"
-            match = re.search(pattern, html, re.DOTALL)
-            if match:
-                data = json.loads(match.group(1))
-                contents = (
-                    data.get("contents", {})
-                    .get("twoColumnSearchResultsRenderer", {})
-                    .get("primaryContents", {})
-                    .get("sectionListRenderer", {})
-                    .get("contents", [])[0]
-                    .get("itemSectionRenderer", {})
-                    .get("contents", [])
-                )
-
-                for item in contents:
-                    if "playlistRenderer" in item:
-                        return item["playlistRenderer"]["playlistId"]
-
-            ids = re.findall(r"\"playlistId\":\"([A-Za-z0-9_-]+)\"", html)
-            for pid in ids:
-                if len(pid) > 2:
-                    return pid
-
-        except Exception:
-            pass
-        return None
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                playlist_id = scanner.feed(decoder.decode(chunk))
+                if playlist_id or scanner.exhausted:
+                    return playlist_id or scanner.finish()
+            return scanner.finish()
+        finally:
+            response.close() # Drop the rest of the page on the floor
 
     def _extract_syllabus(self, url: str, max_items: int = 30):
         print("📖 Extracting syllabus chapters...")
 
-        ydl_opts = {
-            "quiet": True,
-            "extract_flat": True,
-            "ignoreerrors": True,
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        with self._ydl_lock:
+            # Stop paginating once max_items entries have been collected
+            self.ydl.params["playlistend"] = max_items
+            info = self.ydl.extract_info(url, download=False)
 
             if not info or "entries" not in info:
                 return {"error": "Could not parse playlist content."}
 
-            syllabus = [
-                entry["title"]
-                for entry in info["entries"]
-                if entry and entry.get("title")
-            ]
+            syllabus = []
+            for entry in info["entries"]:
+                if entry and entry.get("title"):
+                    syllabus.append(entry["title"])
+                if len(syllabus) >= max_items:
+                    break
 
             return {
                 "course_title": info.get("title", "Custom Curriculum"),
                 "url": url,
-                "total_items": len(syllabus),
-                "syllabus": syllabus[:max_items],
+                "total_items": info.get("playlist_count") or len(syllabus),
+                "syllabus": syllabus,
             }
 
 
+_builder: Optional[CurriculumBuilder] = None
+_builder_lock = threading.Lock()
+
+
+def get_curriculum_builder() -> CurriculumBuilder:
+    # Shared so the HTTP session and YoutubeDL instance survive across tool calls
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                _builder = CurriculumBuilder()
+    return _builder
+
+
 class YouTubePlaylistCurriculumInput(BaseModel):
     topic: str = Field(...)
     max_items: int = Field(30, ge=1, le=100)
@@ -113,6 +196,10 @@ def youtube_playlist_curriculum_search(topic: str, max_items: int = 30) -> str:
     Returns:
         JSON string containing course title, URL, total items, and syllabus list
     """
-    builder = CurriculumBuilder()
-    data = builder.generate_roadmap_data(topic, max_items=max_items)
+    builder = get_curriculum_builder()
+    data = get_or_fetch(
+        topic,
+        max_items,
+        lambda: builder.generate_roadmap_data(topic, max_items=max_items),
+    )
     return json.dumps(data)
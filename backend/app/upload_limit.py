@@ -0,0 +1,53 @@
+from typing import Iterable
+
+from fastapi import HTTPException
+
+
+class UploadLimitMiddleware:
+    """
+    Caps request bodies on the given paths before anything parses them.
+
+    FastAPI spools multipart forms to disk before the endpoint runs, so a
+    size check inside the handler only happens after the whole body was
+    received. Here a declared Content-Length over the cap is rejected
+    straight away, and chunked / lying clients are cut off as soon as the
+    streamed bytes exceed it.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing; FastAPI re-raises HTTPException as is
+                    raise HTTPException(status_code=413, detail="Proof upload too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send):
+        body = b'{"detail":"Proof upload too large"}'
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+# python benchmarks/playlist_scanner.py works from backend/ as well as -m
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.tools.youtube_curriculum import CurriculumBuilder
+
+# Regression check + micro-benchmark for the YouTube playlist id lookup.
+# PlaylistIdScanner (whole page and chunked streaming) must pick the same id
+# as the original regex + json.loads extraction, on a trimmed saved results
+# page. --head-kb / --tail-kb put back roughly the amount of script a real
+# page carries before and after ytInitialData.
+#
+#   cd backend && python -m benchmarks.playlist_scanner [--head-kb 400] [--tail-kb 300] [--runs 200]
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "youtube_results.html")
+HEAD_MARKER = "<!-- several hundred KB of player/polyfill scripts removed -->"
+TAIL_MARKER = "<!-- footer scripts and service worker registration removed -->"
+
+
+def legacy_first_playlist_id(html: str):
+    # The pre-scanner implementation, kept verbatim as the reference
+    try:
+        pattern = r"var ytInitialData = ({.*?});"
+        match = re.search(pattern, html, re.DOTALL)
+        if match:
+            data = json.loads(match.group(1))
+            contents = (
+                data.get("contents", {})
+                .get("twoColumnSearchResultsRenderer", {})
+                .get("primaryContents", {})
+                .get("sectionListRenderer", {})
+                .get("contents", [])[0]
+                .get("itemSectionRenderer", {})
+                .get("contents", [])
+            )
+
+            for item in contents:
+                if "playlistRenderer" in item:
+                    return item["playlistRenderer"]["playlistId"]
+
+        ids = re.findall(r"\"playlistId\":\"([A-Za-z0-9_-]+)\"", html)
+        for pid in ids:
+            if len(pid) > 2:
+                return pid
+
+    except Exception:
+        pass
+    return None
+
+
+class FakeResponse:
+    """Just enough of requests.Response for _stream_first_playlist_id()."""
+
+    def __init__(self, html: str):
+        self.body = html.encode("utf-8")
+        self.encoding = "utf-8"
+        self.consumed = 0
+
+    def iter_content(self, chunk_size: int):
+        for start in range(0, len(self.body), chunk_size):
+            chunk = self.body[start:start + chunk_size]
+            self.consumed += len(chunk)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+def streamed_first_playlist_id(html: str):
+    response = FakeResponse(html)
+    return CurriculumBuilder._stream_first_playlist_id(response), response.consumed
+
+
+def load_fixture(head_kb: int, tail_kb: int) -> str:
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        html = f.read()
+    filler = '<script nonce="pad">var _pad="' + "x" * 1000 + '";</script>\n'
+    return html.replace(HEAD_MARKER, filler * head_kb).replace(TAIL_MARKER, filler * tail_kb)
+
+
+def _without_playlist_renderers(html: str) -> str:
+    start = html.index("var ytInitialData = ") + len("var ytInitialData = ")
+    end = html.index(";</script>", start)
+    data = json.loads(html[start:end])
+    section = data["contents"]["twoColumnSearchResultsRenderer"]["primaryContents"]["sectionListRenderer"]
+    items = section["contents"][0]["itemSectionRenderer"]
+    items["contents"] = [item for item in items["contents"] if "playlistRenderer" not in item]
+    return html[:start] + json.dumps(data, separators=(",", ":")) + html[end:]
+
+
+def variants(html: str) -> dict:
+    # Renderer result, only a mix (fallback id), and no playlist ids at all
+    return {
+        "results page": html,
+        "mix only": _without_playlist_renderers(html),
+        "no results": html.replace('"playlistId"', '"videoId"'),
+    }
+
+
+def check(html: str) -> bool:
+    ok = True
+    for name, page in variants(html).items():
+        expected = legacy_first_playlist_id(page)
+        whole = CurriculumBuilder._extract_first_playlist_id(page)
+        streamed, _ = streamed_first_playlist_id(page)
+        match = expected == whole == streamed
+        ok = ok and match
+        print(f"{'OK ' if match else 'FAIL'} {name:13} legacy={expected} scanner={whole} streamed={streamed}")
+    return ok
+
+
+def bench(label: str, fn, html: str, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn(html)
+    per_call = (time.perf_counter() - started) / runs * 1000
+    print(f"{label:22} {per_call:8.3f} ms/call")
+    return per_call
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare PlaylistIdScanner with the legacy regex + json.loads path")
+    parser.add_argument("--head-kb", type=int, default=400, help="script padding before ytInitialData, in KB")
+    parser.add_argument("--tail-kb", type=int, default=300, help="script padding after ytInitialData, in KB")
+    parser.add_argument("--runs", type=int, default=200, help="iterations per benchmark")
+    args = parser.parse_args()
+
+    html = load_fixture(args.head_kb, args.tail_kb)
+    print(f"Fixture: {len(html.encode('utf-8')) // 1024} KB\n")
+
+    if not check(html):
+        sys.exit(1)
+
+    print()
+    bench("legacy regex+json", legacy_first_playlist_id, html, args.runs)
+    bench("scanner (whole page)", CurriculumBuilder._extract_first_playlist_id, html, args.runs)
+    bench("scanner (streamed)", lambda page: streamed_first_playlist_id(page), html, args.runs)
+    _, consumed = streamed_first_playlist_id(html)
+    print(f"\nStreamed path read {consumed // 1024} of {len(html.encode('utf-8')) // 1024} KB before hanging up")
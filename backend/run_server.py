@@ -9,6 +9,8 @@ import fastapi
 import fastapi.middleware.cors
 import starlette.middleware.cors
 import sqlmodel
+import aiosqlite # Loaded by name by SQLAlchemy's sqlite+aiosqlite dialect
+import sqlalchemy.dialects.sqlite.aiosqlite
 import pydantic
 import langchain_groq
 import langchain_core
@@ -2,6 +2,23 @@ import axios from 'axios';
 
 const API_URL = 'http://127.0.0.1:8000';
 
+// One Idempotency-Key per logical write: a double click or a retry after a
+// failed request reuses the key of the identical request still outstanding,
+// so the backend runs it once and replays the stored response.
+const pendingKeys = new Map();
+
+const idempotentPost = async (path, body) => {
+  const fingerprint = `${path}:${JSON.stringify(body)}`;
+  if (!pendingKeys.has(fingerprint)) {
+    pendingKeys.set(fingerprint, crypto.randomUUID());
+  }
+  const res = await axios.post(`${API_URL}${path}`, body, {
+    headers: { 'Idempotency-Key': pendingKeys.get(fingerprint) }
+  });
+  pendingKeys.delete(fingerprint);
+  return res;
+};
+
 export const api = {
   onboardUser: async (data) => {
     // data = { name, work_hours, core_goals, bad_habits }
@@ -10,12 +27,12 @@ export const api = {
   },
 
   planDay: async (goal, time) => {
-    const res = await axios.post(`${API_URL}/plan`, { goal, available_time: time });
+    const res = await idempotentPost('/plan', { goal, available_time: time });
     return res.data;
   },
 
   verifyTask: async (taskId, proof, image = null) => {
-    const res = await axios.post(`${API_URL}/verify`, {
+    const res = await idempotentPost('/verify', {
       task_id: taskId,
       proof_content: proof,
       proof_image: image // Add this
@@ -62,7 +79,7 @@ export const api = {
   },
 
   confirmCampaign: async (campaignPlan) => {
-    const res = await axios.post(`${API_URL}/campaign/confirm`, {
+    const res = await idempotentPost('/campaign/confirm', {
       campaign_plan: campaignPlan
     });
     return res.data;